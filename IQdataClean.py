@@ -4,46 +4,91 @@ process_iq_cleaned.py
 1. Extract IQ from 'extracted_data.txt'
 2. Remove flat/no-signal regions
 3. Apply DC block (mean subtraction)
-4. Save to 'IQData_cleaned.txt'
+4. Save to 'IQData_cleaned.npy' (+ .json sidecar)
 5. Plot time-domain and FFT spectrum
 """
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
+from iq_capture import load_capture, save_capture
 
 RAW_FILE = "extracted_data.txt"
-CLEANED_FILE = "IQData_cleaned.txt"
+CLEANED_FILE = "IQData_cleaned.npy"
 WINDOW = 50
 VAR_THRESHOLD = 1e-6  # tune this to match flatness detection sensitivity
 
 def load_iq(filepath):
-    iq = []
-    with open(filepath, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            parts = line.split()
-            if len(parts) < 2:
-                continue
-            try:
-                i, q = float(parts[0]), float(parts[1])
-                iq.append(i + 1j*q)
-            except ValueError:
-                continue
-    return np.array(iq)
+    """Loads IQ from a binary capture (.npy/.cfile) or a "real imag" text dump."""
+    iq, _ = load_capture(filepath)
+    return iq
 
 def save_iq(iq, filepath):
-    with open(filepath, 'w') as f:
-        for s in iq:
-            f.write(f"{s.real:.6f} {s.imag:.6f}\n")
-
-def remove_flat_regions(iq, window=WINDOW, threshold=VAR_THRESHOLD):
-    mask = np.ones(len(iq), dtype=bool)
-    for i in range(len(iq) - window):
-        chunk = iq[i:i+window]
-        if np.var(chunk.real) < threshold and np.var(chunk.imag) < threshold:
-            mask[i:i+window] = False
+    """Saves IQ as a binary complex64 capture; use iq_capture.export_text for text."""
+    save_capture(filepath, iq)
+
+def _window_variance(x, window, block):
+    """
+    Approximate variance of x[i:i+window] for every i, plus an absolute error bound.
+    Cumulative sums are taken per block on block-centred data so rounding stays small.
+    """
+    n_windows = len(x) - window + 1
+    var = np.empty(n_windows)
+    err = np.empty(n_windows)
+    eps_in = np.finfo(x.dtype).eps
+    eps = np.finfo(np.float64).eps
+
+    for start in range(0, n_windows, block):
+        stop = min(start + block, n_windows)
+        raw = x[start:stop + window - 1]
+        seg = raw.astype(np.float64)
+        seg -= seg.mean()
+        c1 = np.concatenate(([0.0], np.cumsum(seg)))
+        c2 = np.concatenate(([0.0], np.cumsum(seg * seg)))
+        s1 = c1[window:] - c1[:-window]
+        s2 = c2[window:] - c2[:-window]
+        mean = s1 / window
+        var[start:stop] = s2 / window - mean * mean
+
+        # Rounding in the cumulative sums here, plus rounding in np.var on the input dtype
+        peak = np.abs(seg).max()
+        raw_peak = np.abs(raw).max()
+        n = len(seg)
+        err[start:stop] = (2 * n * eps * (c2[-1] + 2 * peak * np.abs(seg).sum()) / window
+                           + 8 * window * eps_in * raw_peak * raw_peak)
+    return var, err
+
+def remove_flat_regions(iq, window=WINDOW, threshold=VAR_THRESHOLD, block=1 << 16):
+    """
+    Drops every sample covered by a window whose I and Q variances are both below threshold.
+
+    Rolling variances come from cumulative sums in O(N); only windows whose estimate
+    lies within rounding error of the threshold are recomputed with np.var, so the
+    result is identical to checking every window with np.var.
+    """
+    iq = np.asarray(iq)
+    n = len(iq)
+    if n <= window:
+        return iq[np.ones(n, dtype=bool)]
+
+    flat = np.ones(n - window, dtype=bool)
+    for part in (iq.real, np.imag(iq)):
+        var, err = _window_variance(part, window, block)
+        var, err = var[:n - window], err[:n - window]
+        below = var < threshold
+        unsure = np.flatnonzero(np.abs(var - threshold) <= 4 * err)
+        windows = sliding_window_view(part, window)
+        for k in range(0, len(unsure), block):
+            idx = unsure[k:k + block]
+            below[idx] = np.var(windows[idx], axis=1) < threshold
+        flat &= below
+
+    # Every flat window start i clears mask[i:i+window]
+    starts = np.flatnonzero(flat)
+    coverage = np.zeros(n + 1, dtype=np.int64)
+    coverage[starts] += 1
+    coverage[starts + window] -= 1
+    mask = np.cumsum(coverage[:n]) == 0
     return iq[mask]
 
 def plot_results(iq, title_prefix=""):
@@ -0,0 +1,103 @@
+"""
+ack_listener.py
+
+One long-lived subscriber for the ACK tone detector that every BPSK_TX
+flowgraph publishes on port 4010 ("1" when the ACK tone is heard, "0" when not).
+
+The SUB socket is created once per process on a shared ZMQ context and simply
+reconnects to each new TX flowgraph, so waiting for an ACK is a blocking
+zmq.Poller call with a deadline instead of a fresh context and a busy loop.
+"""
+
+import time
+import zmq
+import zmq_ports
+import metrics
+import tracing
+
+ACK_PORT = zmq_ports.ACK_PORT
+ACK_ADDRESS = f"tcp://localhost:{ACK_PORT}"
+
+
+class AckListener:
+    """Blocking, timeout-aware ACK waits on the detector port."""
+
+    def __init__(self, address=ACK_ADDRESS, context=None):
+        self.address = address
+        self.context = context or zmq.Context.instance()
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(address)
+        self.socket.setsockopt_string(zmq.SUBSCRIBE, "")
+        self.poller = zmq.Poller()
+        self.poller.register(self.socket, zmq.POLLIN)
+
+    def flush(self):
+        """Discards detector messages left over from a previous flowgraph."""
+        while self.poller.poll(0):
+            self.socket.recv_string()
+
+    def wait_for_ack(self, timeout=None, on_waiting=None, status_interval=1.0):
+        """
+        Blocks until the detector reports "1" or timeout seconds pass.
+        on_waiting() is called every status_interval seconds while nothing has arrived.
+        Returns True if the ACK was received, False on timeout.
+        """
+        start = time.monotonic()
+        with tracing.span("ack_wait", timeout=timeout) as span:
+            acked = self._wait_for_ack(timeout, on_waiting, status_interval)
+            span.set(acked=acked)
+        metrics.observe("airnode_ack_wait_seconds", time.monotonic() - start, acked=str(acked).lower())
+        return acked
+
+    def _wait_for_ack(self, timeout, on_waiting, status_interval):
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        next_status = now + status_interval
+
+        while True:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return False
+
+            wake_at = next_status if deadline is None else min(next_status, deadline)
+            if self.poller.poll(max(0, int((wake_at - now) * 1000))):
+                if self.socket.recv_string().strip() == "1":
+                    return True
+                continue
+
+            if time.monotonic() >= next_status:
+                if on_waiting:
+                    on_waiting()
+                next_status += status_interval
+
+    def wait_for_ack_with_retry(self, start, stop, timeout, attempts=3, backoff=1.0, backoff_factor=2.0,
+                                on_waiting=None, on_retry=None):
+        """
+        Runs start() (e.g. launch a TX flowgraph) and waits for the ACK, retrying with backoff.
+
+        start() returns a handle that is passed to stop(handle) after every attempt,
+        whether or not it was acknowledged. on_retry(attempt) is called before each
+        retry. Returns True as soon as an attempt is acknowledged, False if all fail.
+        """
+        delay = backoff
+        for attempt in range(1, attempts + 1):
+            self.flush()
+            handle = start()
+            try:
+                if self.wait_for_ack(timeout, on_waiting):
+                    return True
+            finally:
+                stop(handle)
+
+            if attempt < attempts:
+                if on_retry:
+                    on_retry(attempt)
+                with tracing.span("ack_backoff", attempt=attempt):
+                    time.sleep(delay)
+                delay *= backoff_factor
+        return False
+
+    def close(self):
+        self.poller.unregister(self.socket)
+        self.socket.close()
@@ -0,0 +1,234 @@
+"""
+air_bus.py
+
+A shared virtual RF channel ("the air") for running every node and the
+ground on one machine. Each simulated radio (node_transceiver with
+AIRNODE_DEVICE=sim:...) streams its TX samples to the bus and receives its RX
+samples from it:
+
+    control   base_port                 PULL  radios report tuning and gain (JSON)
+    slot k    base_port + 1 + 2k        PULL  TX samples of the radio in slot k (complex64)
+              base_port + 2 + 2k        PUSH  RX samples for the radio in slot k
+
+The bus runs in real time, in ticks of `tick` seconds. Every tick it takes
+one block from each transmitter (silence if the radio has not produced
+one). ZMQ backpressure keeps each TX flowgraph at the sample rate. For every
+receiver, it sums the other transmitters after applying the link impairments:
+
+    LO offset    shifted by the two radios' LO error difference (lo_offset, Hz)
+    tuning       "baseband": every transmission is heard, only the LO difference applies
+                 "rf": also shifted by the tuning difference, and dropped outside +-fs/2
+    delay        delay of the transmitter plus delay of the receiver (seconds)
+    loss         a tick of a link is erased with probability 1-(1-loss_t)(1-loss_r)
+    attenuation  attenuation of both ends (dB)
+    noise        complex AWGN at the receiver (noise_db, dBFS)
+
+"baseband" is the default because node_transceiver's two-tone plan has the
+master transmit at 435 MHz while the slave listens at 430 MHz. The tones then
+fall outside a 5 MHz capture, and "rf" would reproduce exactly that.
+"""
+
+import json
+import threading
+import time
+import numpy as np
+import zmq
+
+SAMPLE_RATE = 5e6
+BASE_PORT = 6000
+TICK = 0.01  # seconds of samples exchanged per bus tick
+TUNINGS = ("baseband", "rf")
+NOISE_BANK = 1 << 20  # precomputed unit-power noise samples; each tick reads a random window
+
+
+class SimRadio:
+    """One slot on the bus and its channel parameters."""
+
+    def __init__(self, name, slot, lo_offset=0.0, delay=0.0, loss=0.0, attenuation_db=0.0, noise_db=-60.0):
+        self.name = name
+        self.slot = slot
+        self.lo_offset = lo_offset
+        self.delay = delay
+        self.loss = loss
+        self.attenuation_db = attenuation_db
+        self.noise_db = noise_db
+        self.rx_freq = 0.0
+        self.tx_freq = 0.0
+        self.rx_gain = 0.0
+        self.tx_gain = 0.0
+        self.pending = bytearray()  # TX bytes received but not yet put on air
+        self.silent_ticks = 0
+
+    def apply(self, message):
+        for key in ("rx_freq", "tx_freq", "rx_gain", "tx_gain"):
+            if key in message:
+                setattr(self, key, float(message[key]))
+
+
+class AirBus:
+    def __init__(self, radios, sample_rate=SAMPLE_RATE, base_port=BASE_PORT, tick=TICK, tuning="baseband",
+                 seed=None, host="127.0.0.1", context=None):
+        if tuning not in TUNINGS:
+            raise ValueError(f"Unknown tuning {tuning!r}; expected one of {TUNINGS}")
+        self.radios = list(radios)
+        self.sample_rate = sample_rate
+        self.base_port = base_port
+        self.block = int(round(sample_rate * tick))
+        self.tick = self.block / sample_rate
+        self.tuning = tuning
+        self.rng = np.random.default_rng(seed)
+        self.host = host
+        self.context = context or zmq.Context.instance()
+        self.stopping = threading.Event()
+        self.thread = None
+
+        self.max_delay = max(int(round(2 * r.delay * sample_rate)) for r in self.radios) if self.radios else 0
+        # History of each transmitter: its last max_delay samples followed by the current block
+        self.lines = {r.slot: np.zeros(self.max_delay + self.block, np.complex64) for r in self.radios}
+        self.phases = {}  # (tx slot, rx slot) -> carrier phase at the start of the next block
+        self.rotators = {}  # frequency offset -> exp(j 2 pi df n / fs) for one block
+        noise = self.rng.standard_normal((2, NOISE_BANK + self.block)).astype(np.float32)
+        self.noise = ((noise[0] + 1j * noise[1]) / np.sqrt(2)).astype(np.complex64)
+        self.stats = {"ticks": 0, "late_ticks": 0, "tx_underruns": 0, "rx_dropped": 0, "erased": 0}
+
+    def address(self, port):
+        return f"tcp://{self.host}:{port}"
+
+    def device(self, radio):
+        """The AIRNODE_DEVICE string for a radio in this bus."""
+        return f"sim:{self.host}:{self.base_port}:{radio.slot}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="air-bus", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        control = self.context.socket(zmq.PULL)
+        control.bind(self.address(self.base_port))
+        tx_sockets, rx_sockets = {}, {}
+        for radio in self.radios:
+            tx = self.context.socket(zmq.PULL)
+            tx.setsockopt(zmq.RCVHWM, 4)
+            tx.bind(self.address(self.base_port + 1 + 2 * radio.slot))
+            rx = self.context.socket(zmq.PUSH)
+            rx.setsockopt(zmq.SNDHWM, 16)
+            rx.setsockopt(zmq.LINGER, 0)
+            rx.bind(self.address(self.base_port + 2 + 2 * radio.slot))
+            tx_sockets[radio.slot], rx_sockets[radio.slot] = tx, rx
+
+        deadline = time.monotonic()
+        try:
+            while not self.stopping.is_set():
+                self._read_control(control)
+                blocks = {radio.slot: self._take_tx(radio, tx_sockets[radio.slot]) for radio in self.radios}
+                self.advance(blocks)
+                for radio in self.radios:
+                    try:
+                        rx_sockets[radio.slot].send(self.receive(radio, blocks), zmq.NOBLOCK, copy=False)
+                    except zmq.Again:
+                        self.stats["rx_dropped"] += 1
+                self.stats["ticks"] += 1
+
+                deadline += self.tick
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.stats["late_ticks"] += 1
+                    if delay < -1.0:
+                        deadline = time.monotonic()  # too far behind to catch up; restart the clock
+        finally:
+            for socket in [control] + list(tx_sockets.values()) + list(rx_sockets.values()):
+                socket.close(linger=0)
+
+    def _read_control(self, control):
+        while True:
+            try:
+                message = json.loads(control.recv(zmq.NOBLOCK))
+            except zmq.Again:
+                return
+            for radio in self.radios:
+                if radio.slot == message.get("slot"):
+                    radio.apply(message)
+
+    def _take_tx(self, radio, socket):
+        """One block of the radio's TX samples, or None if it sent nothing this tick."""
+        need = self.block * 8
+        while len(radio.pending) < need:
+            try:
+                radio.pending += socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+        if not radio.pending:
+            return None
+        if len(radio.pending) < need:
+            self.stats["tx_underruns"] += 1
+            block = np.zeros(self.block, np.complex64)
+            usable = len(radio.pending) // 8 * 8
+            block[:usable // 8] = np.frombuffer(bytes(radio.pending[:usable]), np.complex64)
+            del radio.pending[:usable]
+            return block
+        block = np.frombuffer(bytes(radio.pending[:need]), np.complex64)
+        del radio.pending[:need]
+        # An idle radio streams zeros; skipping them keeps the mixing cost to the active links
+        return block if block.any() else None
+
+    def receive(self, receiver, blocks):
+        """The receiver's RX block for this tick: impaired sum of every other transmitter plus noise."""
+        start = self.rng.integers(0, NOISE_BANK)
+        out = self.noise[start:start + self.block] * np.float32(10 ** (receiver.noise_db / 20))
+
+        for radio in self.radios:
+            if radio is receiver:
+                continue
+            if blocks[radio.slot] is None and (radio.silent_ticks - 1) * self.block > self.max_delay:
+                continue  # nothing of it is still in flight
+
+            offset = radio.lo_offset - receiver.lo_offset
+            if self.tuning == "rf":
+                offset += radio.tx_freq - receiver.rx_freq
+                if abs(offset) >= self.sample_rate / 2:
+                    continue
+            if self.rng.random() < 1 - (1 - radio.loss) * (1 - receiver.loss):
+                self.stats["erased"] += 1
+                continue
+
+            delay = int(round((radio.delay + receiver.delay) * self.sample_rate))
+            line = self.lines[radio.slot]
+            end = len(line) - delay
+            signal = line[end - self.block:end]
+            gain = np.float32(10 ** (-(radio.attenuation_db + receiver.attenuation_db) / 20))
+            out = out + signal * (gain * self._carrier(radio.slot, receiver.slot, offset))
+        return out.astype(np.complex64, copy=False)
+
+    def _carrier(self, tx_slot, rx_slot, offset):
+        """exp(j 2 pi offset t) over this block, phase-continuous per link."""
+        if offset == 0:
+            return np.complex64(1)
+        rotator = self.rotators.get(offset)
+        if rotator is None:
+            n = np.arange(self.block)
+            rotator = self.rotators[offset] = np.exp(2j * np.pi * offset * n / self.sample_rate).astype(np.complex64)
+        phase = self.phases.get((tx_slot, rx_slot), 0.0)
+        self.phases[(tx_slot, rx_slot)] = (phase + 2 * np.pi * offset * self.block / self.sample_rate) % (2 * np.pi)
+        return rotator * np.complex64(np.exp(1j * phase))
+
+    def advance(self, blocks):
+        """Shifts this tick's blocks into every transmitter's history (called once per tick, before receive)."""
+        for radio in self.radios:
+            line = self.lines[radio.slot]
+            block = blocks[radio.slot]
+            line[:-self.block] = line[self.block:]
+            if block is None:
+                line[-self.block:] = 0
+                radio.silent_ticks += 1
+            else:
+                line[-self.block:] = block
+                radio.silent_ticks = 0
@@ -0,0 +1,536 @@
+"""
+air_node.py
+
+The air node runtime. One process per node, configured instead of copied:
+
+    python3 air_node.py --id Node4 --nodes Node1,Node2,Node3,Node4
+    AIRNODE_ID=Node2 python3 air_node.py
+    python3 air_node.py --config node.json --set ack_timeout=45
+
+Settings are taken from, in increasing priority: DEFAULTS, a JSON (or YAML)
+config file given by --config or AIRNODE_CONFIG, AIRNODE_<KEY> environment
+variables, and the command line. Every key in DEFAULTS can be set on the
+command line with --set key=value.
+
+Flowgraph names are templates filled in with {node} (the peer or this node).
+The slaves a node measures as master come from
+master_schedule.pairwise_schedule over the node list. A mesh grows by
+listing more nodes, with no new scripts. node1.py, node2.py and node3.py are
+kept as thin wrappers for the existing launch commands.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import metrics
+import tracing
+from set_command import set_command
+from extract_command import CommandStreamExtractor
+from file_watch import FileWatcher
+from ack_listener import AckListener
+from flowgraph_manager import get_manager
+from zmq_ports import ACK_PORT
+from master_schedule import MasterScheduler, PAIRINGS, SCHEDULES, result_header, slaves_of
+from framing import middle_frame
+from reassembly import PacketVoter
+from command_dictionary import get_dictionary
+from frame_format import (TYPE_DATA, FrameFileReader, command_fields, decode_frames,
+                          encode_frame, frame_file, is_framed, node_id)
+import master_mode
+import slavemode
+
+DEFAULTS = {
+    "identifier": "Node1",
+    "nodes": ["Node1", "Node2", "Node3"],
+    "pairing": "ordered",  # see master_schedule.PAIRINGS
+    "slave_schedule": "sequential",  # or "deferred": measure every slave, then upload all results (see master_schedule.py)
+    "combined_flowgraph": False,  # one node_transceiver flowgraph for every role; not yet validated on hardware
+    "binary_frames": False,  # CRC-checked frames (frame_format.py) instead of the padded text format; every node and the ground must agree
+    # Flowgraphs; {node} is this node for rx_flowgraph and the peer for the TX ones
+    "rx_flowgraph": "BPSK_RX_{node}",
+    "command_flowgraph": "BPSK_TX_{node}",
+    "data_flowgraph": "BPSK_TX_DATA_{node}",
+    "upload_flowgraph": "BPSK_TX_DATA_GROUND",
+    "ack_flowgraph": "ack_tx",
+    "ack_port": ACK_PORT,  # ACK tone detector of the TX flowgraphs
+    # Timings
+    "ack_timeout": 30.0,  # seconds to wait for an ACK tone per attempt
+    "ack_attempts": 3,
+    "data_timeout": 240.0,  # seconds to wait for a slave's measurement before skipping the slave
+    "initial_ack_hold": 10.0,  # seconds the master keeps its first ACK tone on air for the ground
+    "ack_hold": 5.0,  # seconds every other ACK tone stays on air
+    "peer_turnaround": 5.0,  # seconds a slave gives the master to bring its RX back up before replying
+    # Unframed (padded text) reception
+    "command_votes": 3,  # matching command copies needed before acting on a command
+    "data_votes": 3,  # copies of the slave's data to vote over
+    "max_data_copies": 15,  # after this many copies, take the best vote even without a clear majority
+    "data_pad_len": 256,  # 'A' run around each repeat of the slave's data
+    "trace": "",  # JSONL span trace file, "{node}" is replaced by the identifier; empty = off (see tracing.py)
+    "metrics_port": 0,  # local HTTP port for Prometheus /metrics; 0 = off (see metrics.py)
+}
+ENV_PREFIX = "AIRNODE_"
+VALID_COMMANDS = {"Master", "Slave", "Idle"}
+
+
+class NodeConfig:
+    """DEFAULTS overridden by keyword arguments, as attributes. Values are converted to the type of their default."""
+
+    def __init__(self, **values):
+        unknown = set(values) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown node settings: {', '.join(sorted(unknown))}")
+        for key, default in DEFAULTS.items():
+            setattr(self, key, _convert(values.get(key, default), default))
+        if self.pairing not in PAIRINGS:
+            raise ValueError(f"Unknown pairing {self.pairing!r}; expected one of {PAIRINGS}")
+        if self.slave_schedule not in SCHEDULES:
+            raise ValueError(f"Unknown schedule {self.slave_schedule!r}; expected one of {SCHEDULES}")
+
+    def flowgraph(self, key, node):
+        return getattr(self, key).format(node=node)
+
+    def targets(self):
+        """The slaves this node measures when it is master."""
+        return slaves_of(self.identifier, self.nodes, self.pairing)
+
+
+def _convert(value, default):
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, list):
+        return list(value) if isinstance(value, (list, tuple)) else [v.strip() for v in str(value).split(",") if v.strip()]
+    return type(default)(value)
+
+
+def read_config_file(path):
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+def load_config(argv=None, environ=None):
+    """Builds a NodeConfig from the config file, AIRNODE_* variables and argv (see the module docstring)."""
+    environ = os.environ if environ is None else environ
+    parser = argparse.ArgumentParser(description="Air node runtime.")
+    parser.add_argument("--id", dest="identifier", help="this node's identifier, e.g. Node4")
+    parser.add_argument("--nodes", help="comma-separated list of every air node in the mesh")
+    parser.add_argument("--pairing", choices=PAIRINGS)
+    parser.add_argument("--schedule", dest="slave_schedule", choices=SCHEDULES)
+    parser.add_argument("--trace", help="write a span trace of every round to this JSONL file")
+    parser.add_argument("--metrics-port", dest="metrics_port", type=int, help="serve /metrics on this local port")
+    parser.add_argument("--config", default=environ.get(ENV_PREFIX + "CONFIG"), help="JSON or YAML settings file")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="any setting in DEFAULTS")
+    args = parser.parse_args(argv)
+
+    values = read_config_file(args.config) if args.config else {}
+    for key in DEFAULTS:
+        env_key = ENV_PREFIX + ("ID" if key == "identifier" else key.upper())
+        if env_key in environ:
+            values[key] = environ[env_key]
+    for item in args.set:
+        key, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"--set expects KEY=VALUE, got {item!r}")
+        values[key.strip()] = value
+    for key in ("identifier", "nodes", "pairing", "slave_schedule", "trace", "metrics_port"):
+        if getattr(args, key) is not None:
+            values[key] = getattr(args, key)
+    return NodeConfig(**values)
+
+
+class AirNode:
+    def __init__(self, identifier=None, config=None):
+        self.config = config or NodeConfig()
+        if identifier is not None:
+            self.config.identifier = identifier
+        self.identifier = self.config.identifier
+        self.state = 'idle'
+        metrics.set_state(self.state)
+        self.round = 0  # master/slave rounds this node has taken part in (the trace's round number)
+        self.bpsk_rx_process = None
+        self.slave_payload = None
+        self.rx_script = self.config.flowgraph("rx_flowgraph", self.identifier)
+        # Flowgraphs run in this process; open the radio (or import the flowgraphs) now so no step pays for it later
+        self.flowgraphs = get_manager()
+        if self.config.combined_flowgraph:
+            self.flowgraphs.attach_transceiver(self.identifier)
+        else:
+            self.flowgraphs.preload([self.rx_script, self.config.ack_flowgraph,
+                                     master_mode.flowgraph_path[:-3], slavemode.flowgraph_path[:-3],
+                                     self.config.upload_flowgraph])
+        self.ack_listener = AckListener(f"tcp://localhost:{self.config.ack_port}")
+        # Analyzers are built once and reused for every measurement in this process
+        self.master_analyzer = master_mode.make_analyzer()
+        self.slave_analyzer = slavemode.make_analyzer()
+        get_dictionary(VALID_COMMANDS)  # build the command correction table before the first poll
+
+    def return_to_idle(self):
+        self.state = 'idle'
+        metrics.set_state(self.state)
+        print("State changed to: idle")
+
+        # Step 1: Clear command.txt or reset it
+        try:
+            with open("command.txt", "w") as f:
+                f.write("")
+            print("command.txt cleared.")
+            with open("out.txt", "w") as f:
+                f.write("")
+            print("out.txt cleared.")
+        except Exception as e:
+            print(f"Error clearing command.txt: {e}")
+
+        # Step 2: Start RX
+        if self.bpsk_rx_process is None or self.bpsk_rx_process.poll() is not None:
+            self.bpsk_rx_process = self.flowgraphs.start(self.rx_script)
+        print(f"started {self.rx_script}")
+
+        input_file_path = 'out.txt'
+        output_file_path = 'command.txt'
+        if self.config.binary_frames:
+            extractor = FrameFileReader(input_file_path)
+        else:
+            extractor = CommandStreamExtractor(input_file_path)
+        voter = PacketVoter(min_repeats=self.config.command_votes)
+        found = None
+
+        # Step 3: Idle loop, woken whenever RX appends to out.txt (only new bytes are scanned).
+        # A framed command passed its CRC, so one copy is enough; an unframed one is only acted
+        # on once command_votes repeated copies agree on it byte by byte.
+        with tracing.span("idle") as span, FileWatcher(input_file_path) as watcher:
+            while self.state == 'idle' and found is None:
+                for message in extractor.poll():
+                    if self.config.binary_frames:
+                        payload = encode_frame(*message)
+                    else:
+                        if not voter.add(message):
+                            continue
+                        payload, _ = voter.result()
+                        voter.reset()
+                    with open(output_file_path, 'wb') as f:
+                        f.write(payload)
+                    command, identifier, source = self.read_command_from_file()
+
+                    if command and identifier and source and identifier == self.identifier:
+                        found = (command, identifier, source)
+                        span.set(command=command, source=source)
+                        break
+                else:
+                    watcher.wait(timeout=1)
+
+        if found:
+            print("Command found in idle. Exiting idle and processing.")
+            self.process_command(*found)  # Move into Master/Slave/etc
+
+    def set_state(self, new_state):
+        # Terminate RX if running before switching roles
+        if self.bpsk_rx_process and self.bpsk_rx_process.poll() is None:
+            print("Terminating BPSK RX before switching state.")
+            self.flowgraphs.stop(self.bpsk_rx_process)
+            self.bpsk_rx_process = None
+
+        self.state = new_state
+        metrics.set_state(self.state)
+        print(f"State changed to: {self.state}")
+        if new_state == 'master':
+            self.become_master()
+        elif new_state == 'slave':
+            self.become_slave()
+
+    def become_master(self):
+        """Handles Master node setup and runs the slave measurements."""
+        with tracing.span("master"):
+            print("[Master] Sending initial ACK to Ground...")
+            self.send_ack(self.config.initial_ack_hold)
+
+            target_nodes = self.config.targets()
+            print(f"[Master] Slaves to measure: {', '.join(target_nodes) or 'none'}")
+            MasterScheduler(self, target_nodes, schedule=self.config.slave_schedule).run()
+
+        print("Returning to idle state.")
+        self.return_to_idle()
+
+    def command_slave(self, node):
+        """Sends the Slave command to node until it ACKs. Returns whether it did."""
+        with open("out.txt", "w") as f:
+            f.write("")
+        set_command(node, "Slave", self.identifier, framed=self.config.binary_frames)
+        print(f"Generated Slave command for {node} from {self.identifier}")
+
+        tx_script = self.config.flowgraph("command_flowgraph", node)
+
+        def start_tx():
+            process = self.flowgraphs.start(tx_script)
+            print(f"{tx_script} started. Listening for ACK...")
+            return process
+
+        acked = self.ack_listener.wait_for_ack_with_retry(
+            start_tx, stop_process, timeout=self.config.ack_timeout, attempts=self.config.ack_attempts,
+            on_waiting=lambda: print("No ACK yet..."),
+            on_retry=lambda attempt: print(f"No ACK from {node} (attempt {attempt}). Retrying..."))
+        print(f"{tx_script} terminated.")
+        if not acked:
+            print(f"No ACK from {node} after {self.config.ack_attempts} attempts. Skipping it.")
+            return False
+        print("Ack received")
+        return True
+
+    def run_two_tone(self):
+        print("master mode up next")
+        master_mode.run_master_mode(self.master_analyzer)
+        print("Master mode finished")
+
+    def receive_slave_data(self, slave=None):
+        """
+        Receives the slave's measurement: the first data frame for this node, or a byte-wise
+        vote over padded copies. Returns False if nothing arrived within data_timeout.
+        """
+        print(f"Restarting {self.rx_script} for EOF monitoring.")
+        self.bpsk_rx_process = self.flowgraphs.start(self.rx_script)
+        deadline = time.monotonic() + self.config.data_timeout
+        try:
+            if self.config.binary_frames:
+                print("Waiting for the slave's data frame in out.txt...")
+                reader = FrameFileReader("out.txt")
+                frame = None
+                with tracing.span("data_wait") as span, FileWatcher("out.txt") as watcher:
+                    while frame is None:
+                        frame = next((f for f in reader.poll() if f.type == TYPE_DATA and
+                                      f.destination == node_id(self.identifier)), None)
+                        if frame is None:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                break
+                            watcher.wait(timeout=min(remaining, 1))
+                    span.set(received=frame is not None)
+                if frame is None:
+                    print(f"No data frame from {slave or 'the slave'} within {self.config.data_timeout:.0f} s.")
+                    return False
+                self.slave_payload = frame.payload.decode('ascii', errors='ignore')
+                print(f"Slave data frame received ({len(frame.payload)} bytes, CRC ok). Terminating {self.rx_script}.")
+                return True
+
+            print("Collecting copies of the slave's data from out.txt...")
+            extractor = CommandStreamExtractor("out.txt", pad_len=self.config.data_pad_len, max_frame_len=1 << 20)
+            voter = PacketVoter(min_repeats=self.config.data_votes, accept=lambda copy: copy.rstrip().endswith(b"EOF_MARKER"))
+            with tracing.span("data_wait") as span, FileWatcher("out.txt") as watcher:
+                while not voter.ready() and voter.copies < self.config.max_data_copies:
+                    for frame in extractor.poll():
+                        voter.add(frame)
+                        if voter.ready():
+                            break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        watcher.wait(timeout=min(remaining, 1))
+                span.set(copies=voter.copies)
+            if not voter.copies:
+                print(f"No copy of {slave or 'the slave'}'s data within {self.config.data_timeout:.0f} s.")
+                return False
+            # At the deadline, the best vote over the copies that did arrive
+            payload, agreement = voter.result(force=True)
+            self.slave_payload = payload.decode('ascii', errors='ignore')
+            print(f"Slave data from {voter.copies} copies (worst byte agreement {agreement:.0%}). Terminating {self.rx_script}.")
+            return True
+        finally:
+            if self.bpsk_rx_process and self.bpsk_rx_process.poll() is None:
+                self.flowgraphs.stop(self.bpsk_rx_process)
+            self.bpsk_rx_process = None
+
+    def send_ack(self, hold=None):
+        hold = self.config.ack_hold if hold is None else hold
+        with tracing.span("ack_tone", hold=hold):
+            ack_process = self.flowgraphs.start(self.config.ack_flowgraph)
+            time.sleep(hold)
+            self.flowgraphs.stop(ack_process)
+
+    def extract_slave_data(self, output_file, slave=None):
+        print("Extracting valid data from out.txt...")
+        extract_valid_transmission(
+            input_file="out.txt",
+            output_file=output_file,
+            master_file="two_tone_master_data.txt",
+            transmission=self.slave_payload,
+            slave=slave
+        )
+        print(f"Saved cleaned transmission to {output_file}")
+        return output_file
+
+    def report_skipped(self, slave, reason):
+        """Uploads a result with no data for slave, so the ground stops waiting for it. Returns whether it ACKed."""
+        print(f"Reporting {slave} as skipped to the ground: {reason}")
+        notice_file = f"Skipped_{slave}.txt"
+        with open(notice_file, 'w') as f:
+            f.write(result_header(slave, reason))
+            f.write("EOF_MARKER\n")
+        return self.upload_to_ground(notice_file)
+
+    def upload_to_ground(self, data_file):
+        """Transmits data_file to the ground (via Data.txt) until it ACKs. Returns whether it did."""
+        if self.config.binary_frames:
+            with open(data_file, 'rb') as f:
+                payload = f.read()
+            with open("Data.txt", 'wb') as f:
+                f.write(encode_frame(TYPE_DATA, self.identifier, "NodeG", payload))
+        elif data_file != "Data.txt":
+            shutil.copyfile(data_file, "Data.txt")
+        print(f"Transmitting {data_file} to the ground...")
+        tx_script = self.config.upload_flowgraph
+
+        def start_tx_data():
+            process = self.flowgraphs.start(tx_script)
+            print(f"{tx_script} flowgraph started. Waiting for ACK...")
+            return process
+
+        acked = self.ack_listener.wait_for_ack_with_retry(
+            start_tx_data, stop_process, timeout=self.config.ack_timeout, attempts=self.config.ack_attempts,
+            on_waiting=lambda: print("No ACK yet from ground..."),
+            on_retry=lambda attempt: print(f"No ground ACK (attempt {attempt}). Retransmitting..."))
+        print(f"{tx_script} flowgraph terminated.")
+        if acked:
+            print("Ground ACK received!")
+        else:
+            print(f"No ground ACK after {self.config.ack_attempts} attempts. Data left in {data_file}.")
+        return acked
+
+    def become_slave(self):
+        """Handles Slave node setup."""
+        with tracing.span("slave"):
+            self.run_slave_round()
+
+        # Step 5: Return to idle
+        self.return_to_idle()
+
+    def run_slave_round(self):
+        """ACKs the master, measures its two-tone and sends the result back until the master ACKs."""
+        # Step 1: Send ACK to master
+        print(f"{self.identifier} is now a Slave. Sending ACK...")
+        self.send_ack()
+
+        # Step 2: Start slavemode
+        slavemode.run_slave_mode(self.slave_analyzer)
+        with tracing.span("peer_turnaround", seconds=self.config.peer_turnaround):
+            time.sleep(self.config.peer_turnaround)
+
+        # Step 3: Transmit using TX flowgraph based on source (sender)
+        _, _, source = self.read_command_from_file()
+        if not source:
+            print("Sender not found in command file. Cannot launch TX flowgraph.")
+            return
+        if self.config.binary_frames:
+            frame_file(slavemode.filename, TYPE_DATA, self.identifier, source)
+        tx_script = self.config.flowgraph("data_flowgraph", source)
+
+        def start_tx():
+            print(f"Transmitting back using TX flowgraph: {tx_script}")
+            return self.flowgraphs.start(tx_script)
+
+        # Step 4: Listen for ACK, retransmitting if the master does not answer
+        print("Listening for ACK from master...")
+        with tracing.span("reply") as span:
+            acked = self.ack_listener.wait_for_ack_with_retry(
+                start_tx, stop_process, timeout=self.config.ack_timeout, attempts=self.config.ack_attempts,
+                on_waiting=lambda: print("No ACK yet..."),
+                on_retry=lambda attempt: print(f"No ACK from master (attempt {attempt}). Retransmitting..."))
+            span.set(acked=acked)
+        if acked:
+            print("ACK received from master.")
+        else:
+            print(f"No ACK from master after {self.config.ack_attempts} attempts.")
+
+    def fuzzy_match(self, word, valid_set, cutoff=0.7):
+        """Returns closest match in valid_set if above cutoff score (same acceptance as difflib, precomputed)."""
+        return get_dictionary(valid_set, cutoff).match(word)
+
+    def read_command_from_file(self, path="command.txt"):
+        """Reads the command file and extracts destination, command, and source."""
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            if is_framed(data):
+                frames = decode_frames(data)
+                return command_fields(frames[0]) if frames else (None, None, None)
+
+            lines = [line.strip() for line in data.decode('utf-8', errors='ignore').splitlines() if line.strip()]
+            if len(lines) < 3:
+                return None, None, None
+
+            identifier = lines[0]
+            raw_command = lines[1]
+            source = lines[2]
+
+            command = self.fuzzy_match(raw_command, VALID_COMMANDS)
+            if not command:
+                return None, None, None
+            return command, identifier, source
+        except FileNotFoundError:
+            return None, None, None
+
+    def process_command(self, command, identifier, source):
+        """Processes commands and includes the source information."""
+        if identifier == self.identifier:
+            if command in ("Master", "Slave"):
+                self.round += 1
+                master, slave = (self.identifier, None) if command == "Master" else (source, self.identifier)
+                tracing.set_context(round=self.round, role=command.lower(), master=master, slave=slave)
+            if command == "Master":
+                self.set_state('master')
+            elif command == "Slave":
+                self.set_state('slave')
+            else:
+                self.set_state('idle')
+        else:
+            print(f"Command for another node: {identifier}. Ignored.")
+
+
+def stop_process(process):
+    """Stops a flowgraph and waits until it has released the radio."""
+    get_manager().stop(process)
+
+
+def extract_valid_transmission(input_file: str, output_file: str, master_file: str, pad_char: str = 'A', min_pad_length: int = 10,
+                               transmission: str = None, slave: str = None):
+    """
+    Extracts the middle transmission from a padded file (or uses the already reassembled
+    transmission), removes EOF_MARKERs from it, appends the master file contents, and then
+    appends a final EOF_MARKER at the end. With slave, the output starts with the
+    "# Slave:" line the ground files the result by.
+    """
+    if transmission is None:
+        # Single pass over the input; corrupted (non-ASCII) bytes are ignored and reading stops after the middle segment
+        transmission = middle_frame(input_file, pad_char, min_pad_length).data.decode('ascii')
+    middle_transmission = transmission.replace("EOF_MARKER", "").strip()
+
+    # Read the master file while ignoring corrupted characters
+    with open(master_file, 'r', errors='ignore') as f_master_read:
+        master_content = f_master_read.read()
+
+    # Write the cleaned output
+    with open(output_file, 'w') as f_out:
+        if slave:
+            f_out.write(result_header(slave))
+        f_out.write(middle_transmission)
+        f_out.write("\n")
+        f_out.write(master_content)
+        f_out.write("\nEOF_MARKER\n")
+
+
+def main(argv=None):
+    config = load_config(argv)
+    tracing.configure(config.trace or None, node=config.identifier)
+    metrics.serve(config.metrics_port, node=config.identifier)
+    metrics.watch_file("out.txt")
+    print(f"Starting {config.identifier} (mesh: {', '.join(config.nodes)}; pairing: {config.pairing})")
+    node = AirNode(config=config)
+    node.return_to_idle()
+
+
+# === Start Node ===
+
+if __name__ == "__main__":
+    main()
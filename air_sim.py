@@ -0,0 +1,164 @@
+"""
+air_sim.py
+
+Runs a complete calibration round on one machine: the air_bus.py channel, one
+process per air node and the ground, with no LimeSDRs.
+
+    python3 air_sim.py                                  # Node1..Node3 and the ground
+    python3 air_sim.py --nodes 8 --lo-spread 2000 --noise-db -40 --loss 0.01 --delay-us 20
+    python3 air_sim.py --config sim.json --workdir /tmp/round1
+
+Each process runs the normal scripts (air_node.py, ground_sc.py) with
+node_transceiver on its bus slot. Every process gets:
+- its own working directory under --workdir (out.txt, command.txt, data files, <name>.log)
+- its own AIRSIM_PORT_OFFSET for the local ZMQ ports
+- AIRNODE_DEVICE pointing at its slot
+- AIRNODE_COMBINED_FLOWGRAPH=1 (the standalone flowgraphs need a LimeSDR)
+
+The optional JSON config overrides the channel per radio:
+
+    {"tuning": "baseband", "seed": 1,
+     "radios": {"Node2": {"lo_offset": 1500, "delay": 2e-5, "loss": 0.02, "attenuation_db": 6, "noise_db": -45}}}
+
+The round time (ground start to ground exit) and the bus statistics are
+printed at the end. They can be compared between runs with the same seed.
+With --trace every process writes trace.jsonl in its directory, and the
+merged Chrome/Perfetto trace is written to <workdir>/trace.json. With
+--metrics-port P every process serves /metrics on P + its slot.
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from air_bus import AirBus, SimRadio, BASE_PORT, SAMPLE_RATE, TICK, TUNINGS
+from master_schedule import PAIRINGS
+from metrics import METRICS_PORT_ENV
+from tracing import TRACE_ENV, export_chrome
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+GROUND = "GROUND"
+
+
+def build_radios(names, lo_spread=0.0, delay=0.0, loss=0.0, noise_db=-60.0, overrides=None, seed=None):
+    """SimRadios for the nodes and the ground, in that order. Node LO errors are drawn uniformly from +-lo_spread Hz."""
+    rng = np.random.default_rng(seed)
+    overrides = overrides or {}
+    radios = []
+    for slot, name in enumerate(list(names) + [GROUND]):
+        params = {"lo_offset": 0.0 if name == GROUND else float(rng.uniform(-lo_spread, lo_spread)),
+                  "delay": delay, "loss": loss, "noise_db": noise_db}
+        params.update(overrides.get(name, {}))
+        radios.append(SimRadio(name, slot, **params))
+    return radios
+
+
+def launch(radio, bus, names, workdir, pairing="ordered", node_args=(), metrics_port=0):
+    """Starts the node (or ground) process for radio in its own directory. Returns (Popen, log file)."""
+    directory = os.path.join(workdir, radio.name)
+    os.makedirs(directory, exist_ok=True)
+    env = dict(os.environ,
+               AIRNODE_DEVICE=bus.device(radio),
+               AIRNODE_COMBINED_FLOWGRAPH="1",
+               AIRSIM_PORT_OFFSET=str(radio.slot + 1),
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO, os.environ.get("PYTHONPATH")])))
+    if metrics_port:
+        env[METRICS_PORT_ENV] = str(metrics_port + radio.slot)
+    if radio.name == GROUND:
+        command = [sys.executable, "-u", os.path.join(REPO, "ground_sc.py"), "--nodes", ",".join(names),
+                   "--pairing", pairing]
+    else:
+        command = [sys.executable, "-u", os.path.join(REPO, "air_node.py"), "--id", radio.name,
+                   "--nodes", ",".join(names), "--pairing", pairing] + list(node_args)
+    log = open(os.path.join(directory, f"{radio.name}.log"), "w")
+    return subprocess.Popen(command, cwd=directory, env=env, stdout=log, stderr=subprocess.STDOUT), log
+
+
+def run_round(names, radios, workdir, sample_rate=SAMPLE_RATE, base_port=BASE_PORT, tick=TICK, tuning="baseband",
+              seed=None, pairing="ordered", node_args=(), node_startup=5.0, timeout=None, metrics_port=0):
+    """Runs one round; returns (ground exit code or None on timeout, round seconds, bus stats)."""
+    bus = AirBus(radios, sample_rate=sample_rate, base_port=base_port, tick=tick, tuning=tuning, seed=seed).start()
+    processes = []
+    try:
+        for radio in radios:
+            if radio.name != GROUND:
+                processes.append(launch(radio, bus, names, workdir, pairing, node_args, metrics_port))
+                print(f"[Sim] {radio.name} on slot {radio.slot} (LO offset {radio.lo_offset:+.1f} Hz)")
+        time.sleep(node_startup)  # let every node open its transceiver and reach idle RX
+
+        started = time.monotonic()
+        ground, ground_log = launch(radios[-1], bus, names, workdir, pairing, metrics_port=metrics_port)
+        processes.append((ground, ground_log))
+        print(f"[Sim] Ground started; logs in {workdir}")
+        try:
+            code = ground.wait(timeout)
+        except subprocess.TimeoutExpired:
+            code = None
+        elapsed = time.monotonic() - started
+    finally:
+        for process, log in processes:
+            if process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            log.close()
+        bus.stop()
+    return code, elapsed, dict(bus.stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=3, help="number of air nodes (Node1..NodeN)")
+    parser.add_argument("--pairing", choices=PAIRINGS, default="ordered")
+    parser.add_argument("--config", help="JSON channel config (see above)")
+    parser.add_argument("--workdir", default=os.path.join(REPO, "sim_run"))
+    parser.add_argument("--lo-spread", type=float, default=1000.0, help="node LO errors are drawn from +-this (Hz)")
+    parser.add_argument("--delay-us", type=float, default=0.0, help="per-radio delay; a link adds both ends")
+    parser.add_argument("--loss", type=float, default=0.0, help="per-radio probability of erasing a tick")
+    parser.add_argument("--noise-db", type=float, default=-60.0, help="receiver noise power (dBFS)")
+    parser.add_argument("--tuning", choices=TUNINGS, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--base-port", type=int, default=BASE_PORT)
+    parser.add_argument("--tick-ms", type=float, default=TICK * 1e3)
+    parser.add_argument("--timeout", type=float, default=None, help="give up on the round after this many seconds")
+    parser.add_argument("--node-arg", action="append", default=[], help="extra air_node.py argument (repeatable)")
+    parser.add_argument("--trace", action="store_true", help="trace every process and merge the traces")
+    parser.add_argument("--metrics-port", type=int, default=0, help="serve /metrics from every process on this port + slot")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    seed = args.seed if args.seed is not None else config.get("seed")
+    tuning = args.tuning or config.get("tuning", "baseband")
+    names = [f"Node{i}" for i in range(1, args.nodes + 1)]
+    radios = build_radios(names, args.lo_spread, args.delay_us * 1e-6, args.loss, args.noise_db,
+                          config.get("radios"), seed)
+
+    workdir = os.path.abspath(args.workdir)
+    if args.trace:
+        for old in glob.glob(os.path.join(workdir, "*", "trace.jsonl")):
+            os.remove(old)
+        os.environ[TRACE_ENV] = "trace.jsonl"  # inherited by every process, relative to its own directory
+
+    code, elapsed, stats = run_round(names, radios, workdir, base_port=args.base_port,
+                                     tick=args.tick_ms / 1e3, tuning=tuning, seed=seed, pairing=args.pairing,
+                                     node_args=args.node_arg, timeout=args.timeout, metrics_port=args.metrics_port)
+    outcome = "timed out" if code is None else f"ground exited with {code}"
+    print(f"[Sim] Round {outcome} after {elapsed:.1f} s")
+    print("[Sim] Bus: " + ", ".join(f"{key} {value}" for key, value in stats.items()))
+    if args.trace:
+        traces = glob.glob(os.path.join(workdir, "*", "trace.jsonl"))
+        print(f"[Sim] Trace: {export_chrome(traces, os.path.join(workdir, 'trace.json'))}")
+    return 0 if code == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
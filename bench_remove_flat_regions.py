@@ -0,0 +1,80 @@
+"""
+bench_remove_flat_regions.py
+
+Compares the original per-sample remove_flat_regions loop with the vectorised
+version in IQdataClean.py on synthetic captures of 10^4 to 10^7 samples, and
+checks that both keep exactly the same samples.
+
+The loop costs two np.var calls per sample, so by default it is only timed up
+to --loop-max samples and extrapolated linearly beyond that.
+
+Usage: python3 bench_remove_flat_regions.py [--sizes 1e4 1e5 1e6 1e7] [--loop-max 1e5]
+"""
+
+import argparse
+import time
+import numpy as np
+from IQdataClean import remove_flat_regions, WINDOW, VAR_THRESHOLD
+
+
+def remove_flat_regions_loop(iq, window=WINDOW, threshold=VAR_THRESHOLD):
+    """The original implementation, kept as the reference for speed and output."""
+    mask = np.ones(len(iq), dtype=bool)
+    for i in range(len(iq) - window):
+        chunk = iq[i:i+window]
+        if np.var(chunk.real) < threshold and np.var(chunk.imag) < threshold:
+            mask[i:i+window] = False
+    return iq[mask]
+
+
+def make_capture(n, seed=0):
+    """Noisy two-tone capture with flat gaps, like the LimeSDR captures around a burst."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / 5e6
+    iq = 0.01 * (np.exp(2j * np.pi * 1e6 * t) + np.exp(2j * np.pi * 2e6 * t))
+    iq += 0.002 * (rng.standard_normal(n) + 1j * rng.standard_normal(n))
+
+    # Flat regions of a few hundred samples, some with noise right at the threshold
+    for start in rng.integers(0, max(1, n - 500), size=max(1, n // 2000)):
+        length = int(rng.integers(60, 500))
+        level = rng.choice([0.0, 1e-4, np.sqrt(VAR_THRESHOLD)])
+        iq[start:start + length] = 0.005 + level * (rng.standard_normal(min(length, n - start)) +
+                                                    1j * rng.standard_normal(min(length, n - start)))
+    return iq.astype(np.complex64)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1e4, 1e5, 1e6, 1e7])
+    parser.add_argument("--loop-max", type=float, default=1e5,
+                        help="largest capture to run the original loop on (default 1e5)")
+    args = parser.parse_args()
+
+    print(f"{'samples':>10} {'loop (s)':>12} {'vectorised (s)':>15} {'speedup':>9} {'kept':>10}  match")
+    loop_rate = None
+    for size in args.sizes:
+        n = int(size)
+        iq = make_capture(n)
+        fast, fast_time = timed(remove_flat_regions, iq)
+
+        if n <= args.loop_max:
+            reference, loop_time = timed(remove_flat_regions_loop, iq)
+            loop_rate = loop_time / n
+            match = "yes" if np.array_equal(reference, fast) else "NO"
+            loop_text = f"{loop_time:12.3f}"
+        else:
+            loop_time = loop_rate * n if loop_rate else float("nan")
+            match = "-"
+            loop_text = f"~{loop_time:11.1f}"
+
+        print(f"{n:>10} {loop_text} {fast_time:15.4f} {loop_time / fast_time:8.0f}x {len(fast):>10}  {match}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+bench_rx_parsers.py
+
+Replays receiver output through the RX-side parsers and reports throughput,
+latency to the first result and peak RSS.
+
+The corpus is built from the recorded captures in the repo. Node1Node2.txt is
+a slave measurement as the ground saved it; extracted_data.txt is one padded
+copy as RX wrote it. Each is wrapped the way the TX block sends it (512-A
+header, payload, 256-A footer), followed by a few bytes of non-ASCII decoder
+noise, and repeated up to each --sizes target. A legacy text command (three
+padded copies of Node2/Slave/Node1) is inserted at --command-at, a fraction
+of the file. A newline follows each command header, so that the line-based
+extract_valid_command_from_stream can see the command. The framed corpus
+carries the same content as frame_format frames, for FrameFileReader.
+
+Parsers:
+    extract_command                     whole-file regex scan for the first message between 512-A blocks
+    extract_valid_command_from_stream   whole-file fuzzy scan for a dest/command/source line triple
+    extract_valid_transmission          middle segment of the capture + master file (node side)
+    extract_middle_segment              middle segment + raw backup (ground side)
+    CommandStreamExtractor              incremental padded-message reader (idle loop, unframed)
+    FrameFileReader                     incremental binary frame decoder (idle loop, framed corpus)
+
+Modes:
+    static   the file is complete before the parser runs; latency = time to the parser's first result
+    growing  a writer appends the file at --rate MB/s while the parser polls every --poll seconds,
+             like the idle loop on a live out.txt; whole-file parsers rescan on every poll.
+             latency = first result minus the moment the bytes it needed were written
+
+Each case runs in a fresh subprocess, so the peak RSS (ru_maxrss) belongs to
+that case alone.
+
+Usage: python3 bench_rx_parsers.py [--sizes 1e6 1e7 1e8 1e9] [--modes static growing] [--parsers ...] [--json out.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+CAPTURES = ["Node1Node2.txt", "extracted_data.txt"]
+HEADER = b"A" * 512
+FOOTER = b"A" * 256
+NOISE = bytes(range(200, 232))  # decoder garbage between bursts (non-ASCII, dropped by every parser)
+COMMAND = b"Node2\nSlave\nNode1\n"
+COMMAND_COPIES = 3
+CHUNK = 1 << 20
+
+# parser -> (corpus kind, what its first result needs to have arrived)
+PARSERS = {
+    "extract_command": ("text", "first_message"),
+    "extract_valid_command_from_stream": ("text", "command"),
+    "extract_valid_transmission": ("text", "middle"),
+    "extract_middle_segment": ("text", "middle"),
+    "CommandStreamExtractor": ("text", "command"),
+    "FrameFileReader": ("framed", "command"),
+}
+
+
+def load_payloads():
+    payloads = []
+    for name in CAPTURES:
+        with open(os.path.join(REPO, name), "rb") as f:
+            payloads.append(f.read().strip(b"A\n"))
+    return payloads
+
+
+def build_corpus(path, size, kind, command_at=0.5):
+    """Writes a corpus of about size bytes and returns the byte offsets each kind of parser needs."""
+    from frame_format import FRAME_PAD, TYPE_DATA, encode_command, encode_frame
+
+    payloads = load_payloads()
+    if kind == "framed":
+        pad = b"A" * FRAME_PAD
+        units = [pad + encode_frame(TYPE_DATA, "Node1", "NodeG", p, seq=i) + pad + NOISE for i, p in enumerate(payloads)]
+        command = (pad + encode_command("Node2", "Slave", "Node1") + pad) * COMMAND_COPIES
+        command_end = len(pad) + len(command) // COMMAND_COPIES
+    else:
+        units = [HEADER + p + FOOTER + NOISE for p in payloads]
+        copy = HEADER + b"\n" + COMMAND + FOOTER
+        command = copy * COMMAND_COPIES
+        command_end = len(copy) + len(HEADER)  # the next header closes the first copy
+
+    needed = {}
+    written = 0
+    inserted = False
+    with open(path, "wb") as f:
+        repeat = 0
+        while written < size:
+            if not inserted and written >= command_at * size:
+                f.write(command)
+                needed["command"] = written + command_end
+                written += len(command)
+                inserted = True
+                continue
+            unit = units[repeat % len(units)]
+            f.write(unit)
+            repeat += 1
+            if repeat == 1:
+                needed["first_message"] = written + len(unit) + len(HEADER)
+            if repeat == 3:
+                needed["middle"] = written + len(HEADER) + 1  # a partial third segment already ends the middle one
+            written += len(unit)
+        if not inserted:
+            f.write(command)
+            needed["command"] = written + command_end
+            written += len(command)
+    return needed
+
+
+# ---- Parsers (run inside the case subprocess) ----
+
+def _is_command(message):
+    from command_dictionary import fuzzy_match
+    lines = [line.strip() for line in message.splitlines() if line.strip()]
+    return len(lines) >= 3 and fuzzy_match(lines[1], {"Master", "Slave", "Idle"}) is not None
+
+
+def make_parser(name, path, work):
+    """Returns poll() -> first result or None. Whole-file parsers redo all their work on every call."""
+    if name == "extract_command":
+        from extract_command import extract_command
+        return lambda: extract_command(path, os.path.join(work, "command_out.txt")) or None
+
+    if name == "extract_valid_command_from_stream":
+        from extract_valid_command_from_file_stream import extract_valid_command_from_stream
+        return lambda: extract_valid_command_from_stream(path, os.path.join(work, "command_out.txt"))[0]
+
+    if name in ("extract_valid_transmission", "extract_middle_segment"):
+        master_file = os.path.join(work, "master.txt")
+        with open(master_file, "wb") as f:
+            f.write(load_payloads()[0][:4096])
+        if name == "extract_valid_transmission":
+            from air_node import extract_valid_transmission
+
+            def extract():
+                extract_valid_transmission(path, os.path.join(work, "data_out.txt"), master_file)
+        else:
+            from ground_sc import extract_middle_segment
+
+            def extract():
+                extract_middle_segment(path, os.path.join(work, "data_out.txt"), "Node1", "Node2", backup=True)
+
+        def poll():
+            try:
+                extract()
+            except (ValueError, FileNotFoundError):
+                return None
+            return True
+        return poll
+
+    if name == "CommandStreamExtractor":
+        from extract_command import CommandStreamExtractor
+        extractor = CommandStreamExtractor(path)
+        return lambda: next((m for m in extractor.poll() if _is_command(m)), None)
+
+    if name == "FrameFileReader":
+        from frame_format import TYPE_COMMAND, FrameFileReader
+        reader = FrameFileReader(path)
+        return lambda: next((f for f in reader.poll() if f.type == TYPE_COMMAND), None)
+
+    raise ValueError(f"Unknown parser: {name}")
+
+
+def _grow(source, target, rate, timeline):
+    """Appends source to target at rate bytes/s, recording (bytes written, time) after each chunk."""
+    chunk = max(4096, min(CHUNK, int(rate / 100)))
+    start = time.monotonic()
+    written = 0
+    with open(source, "rb") as src, open(target, "ab") as dst:
+        while True:
+            data = src.read(chunk)
+            if not data:
+                break
+            dst.write(data)
+            dst.flush()
+            written += len(data)
+            timeline.append((written, time.monotonic()))
+            delay = start + written / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def run_case(args):
+    """Runs one parser on one corpus in this process and prints the result as JSON."""
+    with open(args.case_file + ".json") as f:
+        needed = json.load(f)[PARSERS[args.case][1]]
+    size = os.path.getsize(args.case_file)
+    work = os.path.dirname(os.path.abspath(args.case_file))
+    os.chdir(work)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if args.case_mode == "static":
+        path = args.case_file
+        poll = make_parser(args.case, path, work)
+        cpu, start = time.process_time(), time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = poll()
+        elapsed = time.monotonic() - start
+        latency = elapsed if result is not None else None
+        polls = 1
+    else:
+        path = os.path.join(work, f"live_{os.getpid()}.txt")
+        open(path, "wb").close()
+        poll = make_parser(args.case, path, work)
+        timeline = []
+        writer = threading.Thread(target=_grow, args=(args.case_file, path, args.rate * 1e6, timeline))
+        cpu, start = time.process_time(), time.monotonic()
+        writer.start()
+        result, polls = None, 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            while result is None:
+                done = not writer.is_alive()
+                polls += 1
+                result = poll()
+                if result is not None or done:
+                    break
+                time.sleep(args.poll)
+        found_at = time.monotonic()
+        writer.join()
+        elapsed = found_at - start
+        arrived = next((t for written, t in timeline if written >= needed), None)
+        latency = found_at - arrived if result is not None and arrived is not None else None
+        os.remove(path)
+
+    print(json.dumps({
+        "parser": args.case, "mode": args.case_mode, "bytes": size, "seconds": elapsed,
+        "cpu_seconds": time.process_time() - cpu, "latency": latency, "found": result is not None,
+        "polls": polls, "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "baseline_rss_kb": baseline,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1e6, 1e7, 1e8])
+    parser.add_argument("--modes", nargs="+", choices=["static", "growing"], default=["static", "growing"])
+    parser.add_argument("--parsers", nargs="+", choices=list(PARSERS), default=list(PARSERS))
+    parser.add_argument("--command-at", type=float, default=0.5, help="where the command sits (fraction of the file)")
+    parser.add_argument("--rate", type=float, default=50.0, help="append rate in growing mode (MB/s)")
+    parser.add_argument("--poll", type=float, default=0.1, help="poll interval in growing mode (s)")
+    parser.add_argument("--growing-max", type=float, default=1e7, help="largest corpus replayed as a growing file")
+    parser.add_argument("--workdir", default=os.path.join(REPO, "bench_rx_corpus"))
+    parser.add_argument("--json", help="also write all results to this file")
+    parser.add_argument("--case", choices=list(PARSERS), help=argparse.SUPPRESS)
+    parser.add_argument("--case-file", help=argparse.SUPPRESS)
+    parser.add_argument("--case-mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        sys.path.insert(0, REPO)
+        return run_case(args)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    print(f"{'parser':<34} {'mode':<8} {'MB':>7} {'time (s)':>9} {'cpu (s)':>8} {'MB/s':>8} "
+          f"{'latency (ms)':>13} {'peak RSS (MB)':>14}  found")
+    for size in args.sizes:
+        corpora = {}
+        for kind in sorted({PARSERS[name][0] for name in args.parsers}):
+            path = os.path.join(args.workdir, f"corpus_{int(size)}_{kind}.txt")
+            if not os.path.exists(path + ".json"):
+                with open(path + ".json", "w") as f:
+                    json.dump(build_corpus(path, int(size), kind, args.command_at), f)
+            corpora[kind] = path
+
+        for mode in args.modes:
+            if mode == "growing" and size > args.growing_max:
+                continue
+            for name in args.parsers:
+                command = [sys.executable, os.path.abspath(__file__), "--case", name, "--case-mode", mode,
+                           "--case-file", corpora[PARSERS[name][0]], "--rate", str(args.rate), "--poll", str(args.poll)]
+                output = subprocess.run(command, capture_output=True, text=True)
+                if output.returncode != 0:
+                    print(f"{name:<34} {mode:<8} failed: {output.stderr.strip().splitlines()[-1:]}")
+                    continue
+                r = json.loads(output.stdout.strip().splitlines()[-1])
+                results.append(r)
+                latency = f"{r['latency'] * 1e3:13.1f}" if r["latency"] is not None else f"{'-':>13}"
+                print(f"{name:<34} {mode:<8} {r['bytes'] / 1e6:7.1f} {r['seconds']:9.3f} {r['cpu_seconds']:8.3f} "
+                      f"{r['bytes'] / 1e6 / max(r['seconds'], 1e-9):8.1f} {latency} {r['peak_rss_kb'] / 1024:14.1f}  "
+                      f"{'yes' if r['found'] else 'no'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
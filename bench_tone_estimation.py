@@ -0,0 +1,144 @@
+"""
+bench_tone_estimation.py
+
+Accuracy versus speed of the two-tone offset estimators, on synthetic captures
+from two_tone_corpus.py. The capture length and SNR are swept. Each trial draws
+a new carrier offset (within +-max-offset) plus DC and IQ errors. Every
+estimator configuration of TwoToneAnalyzer then estimates the frequency shift,
+and it is compared with the true offset:
+
+    bin         FFT peak bin, no interpolation
+    parabolic   parabolic sub-bin fit (master_mode/slavemode default)
+    jacobsen    Jacobsen's estimator on the unwindowed FFT
+    welch       Welch-averaged spectrum (nperseg="auto") + parabolic fit
+    zoom        parabolic + zoomed DFT refinement
+
+For each configuration the table reports the median and 95th-percentile
+absolute shift error, the share of trials where both tones were not found,
+and the median analysis time. The summary lists, per estimator and SNR, the
+shortest capture whose p95 error is within --budget Hz. That is the shortest
+capture the master/slave could stop at.
+
+--gaps adds flat regions to each capture. --clean runs
+IQdataClean.remove_flat_regions and a DC block before estimating, and its
+time is counted. Dropping samples breaks the tones' phase continuity, so
+this shows whether cleaning helps or hurts the estimate. --corpus scores
+captures saved by two_tone_corpus.py instead of generating them.
+
+Usage: python3 bench_tone_estimation.py [--lengths 1e4 1e5 1e6 4e6] [--snr 0 10 20 30] [--trials 10] [--budget 1]
+"""
+
+import argparse
+import glob
+import os
+import time
+from collections import defaultdict
+import numpy as np
+from iq_capture import load_capture
+from two_tone_analysis import TwoToneAnalyzer, SAMPLE_RATE
+from two_tone_corpus import Impairments, make_two_tone, random_impairments
+
+ESTIMATORS = {
+    "bin": dict(interpolation=None),
+    "parabolic": dict(interpolation="parabolic"),
+    "jacobsen": dict(interpolation="jacobsen"),
+    "welch": dict(interpolation="parabolic", nperseg="auto"),
+    "zoom": dict(interpolation="parabolic", refine=True),
+}
+
+
+def clean(iq):
+    from IQdataClean import remove_flat_regions
+    kept = remove_flat_regions(iq)
+    return kept - np.mean(kept)
+
+
+def score(analyzer, iq, offset, cleaning=False):
+    """(absolute shift error in Hz or None if the tones were not found, seconds)."""
+    start = time.perf_counter()
+    result = analyzer.analyze(clean(iq) if cleaning else iq)
+    elapsed = time.perf_counter() - start
+    if not result["tones_found"]:
+        return None, elapsed
+    return abs(result["frequency_shift"] - offset), elapsed
+
+
+def synthetic_trials(lengths, snrs, trials, seed, max_offset, gaps):
+    """Yields (length, snr_db, capture, true offset)."""
+    rng = np.random.default_rng(seed)
+    for n in lengths:
+        for snr_db in snrs:
+            for _ in range(trials):
+                imp = random_impairments(rng, snr_db, max_offset=max_offset, gaps=gaps)
+                yield n, snr_db, make_two_tone(n, imp, seed=int(rng.integers(1 << 31))), imp.offset
+
+
+def corpus_trials(directory):
+    """Yields (length, snr_db, capture, true offset) for the captures two_tone_corpus.py saved."""
+    for path in sorted(glob.glob(os.path.join(directory, "*.npy"))):
+        iq, metadata = load_capture(path)
+        if "offset" in metadata:
+            yield len(iq), metadata["snr_db"], np.asarray(iq), metadata["offset"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=float, nargs="+", default=[1e4, 1e5, 1e6, 4e6])
+    parser.add_argument("--snr", type=float, nargs="+", default=[0, 10, 20, 30], help="dB")
+    parser.add_argument("--trials", type=int, default=10, help="captures per (length, SNR)")
+    parser.add_argument("--estimators", nargs="+", choices=list(ESTIMATORS), default=list(ESTIMATORS))
+    parser.add_argument("--budget", type=float, default=1.0, help="accuracy budget for the summary (Hz, p95)")
+    parser.add_argument("--max-offset", type=float, default=5e3, help="carrier offsets are drawn from +-this (Hz)")
+    parser.add_argument("--gaps", type=int, default=0, help="flat regions per capture")
+    parser.add_argument("--clean", action="store_true", help="remove flat regions and DC before estimating")
+    parser.add_argument("--corpus", help="score the captures in this two_tone_corpus.py directory instead")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    analyzers = {name: TwoToneAnalyzer(0.0, sample_rate=SAMPLE_RATE, **settings)
+                 for name, settings in ESTIMATORS.items() if name in args.estimators}
+    if args.corpus:
+        trials = corpus_trials(args.corpus)
+    else:
+        trials = synthetic_trials([int(n) for n in args.lengths], args.snr, args.trials, args.seed,
+                                  args.max_offset, args.gaps)
+
+    # Untimed first run so FFT plans and windows are not charged to the first trial
+    for analyzer in analyzers.values():
+        analyzer.analyze(make_two_tone(4096, Impairments(), seed=0))
+
+    errors = defaultdict(list)  # (estimator, length, snr) -> errors (None = tones not found)
+    times = defaultdict(list)
+    for n, snr_db, iq, offset in trials:
+        for name, analyzer in analyzers.items():
+            analyzer.warm_up(n)
+            error, elapsed = score(analyzer, iq, offset, args.clean)
+            errors[name, n, snr_db].append(error)
+            times[name, n, snr_db].append(elapsed)
+
+    print(f"{'estimator':<10} {'samples':>9} {'ms of air':>9} {'SNR dB':>7} {'median err':>11} {'p95 err':>9} "
+          f"{'missed':>7} {'time (ms)':>10}")
+    passing = {}
+    for (name, n, snr_db), errs in sorted(errors.items(), key=lambda item: (list(analyzers).index(item[0][0]),) + item[0][1:]):
+        found = [e for e in errs if e is not None]
+        missed = 1 - len(found) / len(errs)
+        median = np.median(found) if found else float("nan")
+        p95 = np.percentile(found, 95) if found else float("nan")
+        print(f"{name:<10} {n:>9} {n / SAMPLE_RATE * 1e3:9.2f} {snr_db:7g} {median:11.3f} {p95:9.3f} "
+              f"{missed:7.0%} {np.median(times[name, n, snr_db]) * 1e3:10.2f}")
+        if not missed and p95 <= args.budget and (name, snr_db) not in passing:
+            passing[name, snr_db] = (n, np.median(times[name, n, snr_db]))
+
+    print(f"\nShortest capture within {args.budget:g} Hz (p95, no misses):")
+    for name in analyzers:
+        for snr_db in sorted({key[2] for key in errors}):
+            if (name, snr_db) in passing:
+                n, elapsed = passing[name, snr_db]
+                print(f"  {name:<10} {snr_db:5g} dB  {n:>9} samples ({n / SAMPLE_RATE * 1e3:.2f} ms), "
+                      f"{elapsed * 1e3:.2f} ms to estimate")
+            else:
+                print(f"  {name:<10} {snr_db:5g} dB  none of the tested lengths")
+
+
+if __name__ == "__main__":
+    main()
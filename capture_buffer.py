@@ -0,0 +1,91 @@
+"""
+capture_buffer.py
+
+Preallocated complex64 storage for samples arriving in ZMQ messages.
+
+Samples are copied straight from each message into one NumPy array (8 bytes per
+sample) instead of being boxed into a Python list. The array grows by doubling,
+or, in ring mode, keeps only the most recent max_samples and counts what it
+overwrote.
+"""
+
+import numpy as np
+
+
+class CaptureBuffer:
+    """Growable or fixed-size (ring) buffer of complex64 samples."""
+
+    def __init__(self, initial_capacity=1 << 20, max_samples=None, dtype=np.complex64):
+        self.dtype = np.dtype(dtype)
+        self.max_samples = max_samples
+        capacity = max_samples if max_samples else initial_capacity
+        self.data = np.empty(capacity, dtype=self.dtype)
+        self.count = 0        # samples currently held
+        self.write_pos = 0    # next index to write (ring mode wraps it)
+        self.total = 0        # samples ever appended
+        self.overwritten = 0  # samples discarded by ring mode
+
+    @classmethod
+    def for_duration(cls, seconds, sample_rate, **kwargs):
+        """Ring buffer holding the most recent `seconds` of samples."""
+        return cls(max_samples=int(seconds * sample_rate), **kwargs)
+
+    def __len__(self):
+        return self.count
+
+    def append_bytes(self, payload):
+        """Appends a raw ZMQ payload of packed samples without intermediate copies."""
+        self.append(np.frombuffer(payload, dtype=self.dtype))
+
+    def append(self, samples):
+        samples = np.asarray(samples, dtype=self.dtype)
+        n = len(samples)
+        if n == 0:
+            return
+        self.total += n
+
+        if self.max_samples:
+            self._append_ring(samples)
+            return
+
+        if self.count + n > len(self.data):
+            grown = np.empty(max(2 * len(self.data), self.count + n), dtype=self.dtype)
+            grown[:self.count] = self.data[:self.count]
+            self.data = grown
+        self.data[self.count:self.count + n] = samples
+        self.count += n
+        self.write_pos = self.count
+
+    def _append_ring(self, samples):
+        capacity = len(self.data)
+        n = len(samples)
+        if n >= capacity:
+            # Only the newest `capacity` samples survive
+            self.overwritten += self.count + n - capacity
+            self.data[:] = samples[-capacity:]
+            self.count = capacity
+            self.write_pos = 0
+            return
+
+        first = min(n, capacity - self.write_pos)
+        self.data[self.write_pos:self.write_pos + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.write_pos = (self.write_pos + n) % capacity
+
+        dropped = max(0, self.count + n - capacity)
+        self.overwritten += dropped
+        self.count = min(capacity, self.count + n)
+
+    def to_array(self):
+        """
+        Returns the held samples oldest-first. In growable mode this is a view
+        (no copy); a wrapped ring buffer is unrolled into a new array.
+        """
+        if not self.max_samples or self.count < len(self.data):
+            start = self.write_pos - self.count if self.max_samples else 0
+            return self.data[start:start + self.count]
+        return np.concatenate((self.data[self.write_pos:], self.data[:self.write_pos]))
+
+    def clear(self):
+        self.count = 0
+        self.write_pos = 0
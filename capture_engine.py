@@ -0,0 +1,254 @@
+"""
+capture_engine.py
+
+Receives the two-tone flowgraph's sample stream (ZMQ PUB on port 5020) on a
+dedicated thread, so the SUB socket is drained continuously no matter what the
+main loop is doing.
+
+Frames are received zero-copy and handed to the main thread through a bounded
+queue. Anything that cannot be kept up with is counted rather than lost
+silently: frames dropped because the queue was full, arrival gaps, and samples
+received versus what the sample rate says should have arrived while recording.
+
+capture_burst wraps the whole detector-gated capture used by master_mode.py
+and slavemode.py.
+"""
+
+import queue
+import threading
+import time
+import numpy as np
+import zmq
+import metrics
+import tracing
+from capture_buffer import CaptureBuffer
+from zmq_ports import SAMPLES_PORT, TWO_TONE_DETECT_PORT
+
+DETECT_ADDRESS = f"tcp://127.0.0.1:{TWO_TONE_DETECT_PORT}"
+DATA_ADDRESS = f"tcp://127.0.0.1:{SAMPLES_PORT}"
+START_TIMEOUT = 5.0  # seconds for the receive thread to connect its socket
+
+
+class CaptureEngine:
+    """Background ZMQ sample receiver with drop accounting."""
+
+    def __init__(self, address=DATA_ADDRESS, context=None, sample_rate=5e6, dtype=np.complex64,
+                 rcvhwm=100000, rcvbuf=4 << 20, queue_size=20000, gap_factor=4.0, gap_slack=0.05):
+        self.address = address
+        self.context = context or zmq.Context.instance()
+        self.sample_rate = sample_rate
+        self.itemsize = np.dtype(dtype).itemsize
+        self.rcvhwm = rcvhwm
+        self.rcvbuf = rcvbuf
+        self.gap_factor = gap_factor
+        self.gap_slack = gap_slack
+
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.recording = threading.Event()
+        self.stopping = threading.Event()
+        self.ready = threading.Event()
+        self.thread = None
+        self.error = None  # exception that ended the receive thread
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.messages = 0
+        self.bytes_received = 0
+        self.queue_dropped_messages = 0
+        self.queue_dropped_bytes = 0
+        self.gaps = 0
+        self.record_start = None
+        self.record_stop = None
+        self.last_arrival = None
+        self.last_duration = 0.0
+
+    def start(self, timeout=START_TIMEOUT):
+        """
+        Starts the receive thread and returns once its socket is connected. Re-raises the
+        thread's exception if it failed to start, and raises TimeoutError if it is not up within timeout.
+        """
+        self.stopping.clear()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="capture-engine", daemon=True)
+        self.thread.start()
+        if not self.ready.wait(timeout):
+            self.stop()
+            raise self.error or TimeoutError(f"Capture thread did not connect to {self.address} within {timeout} s")
+        if self.error is not None:
+            self.stop()
+            raise self.error
+
+    def start_recording(self):
+        self.reset_stats()
+        self.record_start = time.monotonic()
+        self.recording.set()
+
+    def stop_recording(self):
+        self.recording.clear()
+        self.record_stop = time.monotonic()
+
+    def stop(self):
+        """Stops recording and joins the receive thread."""
+        if self.recording.is_set():
+            self.stop_recording()
+        self.stopping.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        try:
+            socket = self.context.socket(zmq.SUB)
+            socket.setsockopt(zmq.RCVHWM, self.rcvhwm)
+            socket.setsockopt(zmq.RCVBUF, self.rcvbuf)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.connect(self.address)
+            socket.setsockopt_string(zmq.SUBSCRIBE, "")
+        except Exception as e:
+            self.error = e  # re-raised by start()
+            self.ready.set()
+            return
+        self.ready.set()
+
+        try:
+            while not self.stopping.is_set():
+                if not socket.poll(100):
+                    continue
+                # Drain everything that is queued before polling again
+                while True:
+                    try:
+                        frame = socket.recv(flags=zmq.NOBLOCK, copy=False)
+                    except zmq.Again:
+                        break
+                    if self.recording.is_set():
+                        self._accept(frame)
+        finally:
+            socket.close()
+            self.ready.clear()
+
+    def _accept(self, frame):
+        now = time.monotonic()
+        size = len(frame.buffer)
+
+        if self.last_arrival is not None:
+            if now - self.last_arrival > self.gap_factor * self.last_duration + self.gap_slack:
+                self.gaps += 1
+        self.last_arrival = now
+        self.last_duration = size / self.itemsize / self.sample_rate
+
+        self.messages += 1
+        self.bytes_received += size
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            self.queue_dropped_messages += 1
+            self.queue_dropped_bytes += size
+
+    def drain_into(self, buffer):
+        """Moves every queued frame into buffer (a CaptureBuffer) and returns the sample count moved."""
+        moved = 0
+        while True:
+            try:
+                frame = self.frames.get_nowait()
+            except queue.Empty:
+                return moved
+            buffer.append_bytes(frame.buffer)
+            moved += len(frame.buffer) // self.itemsize
+
+    def stats(self):
+        """Receive/drop counters for the current (or last) recording."""
+        if self.record_start is None:
+            duration = 0.0
+        else:
+            duration = (self.record_stop or time.monotonic()) - self.record_start
+        received = self.bytes_received // self.itemsize
+        kept = received - self.queue_dropped_bytes // self.itemsize
+        expected = int(duration * self.sample_rate)
+        return {
+            "duration_s": round(duration, 6),
+            "messages": self.messages,
+            "bytes_received": self.bytes_received,
+            "samples_received": received,
+            "samples_kept": kept,
+            "samples_expected": expected,
+            "samples_missing": max(0, expected - received),
+            "queue_dropped_messages": self.queue_dropped_messages,
+            "queue_dropped_bytes": self.queue_dropped_bytes,
+            "gaps": self.gaps,
+            "throughput_sps": round(received / duration, 1) if duration > 0 else 0.0,
+        }
+
+
+def capture_burst(context=None, detect_address=DETECT_ADDRESS, data_address=DATA_ADDRESS, sample_rate=5e6,
+                  max_capture_seconds=None, rcvhwm=100000, linger_after_loss=0.0):
+    """
+    Records the samples of one two-tone burst: waits for the detector (port 8040)
+    to report "1", records until it reports "0", then waits linger_after_loss
+    seconds (e.g. while the slave keeps retransmitting).
+
+    Returns (samples, detection_time, stats); samples is empty if nothing arrived.
+    """
+    context = context or zmq.Context.instance()
+
+    detect_socket = context.socket(zmq.SUB)
+    detect_socket.connect(detect_address)
+    detect_socket.setsockopt_string(zmq.SUBSCRIBE, '')
+
+    # Samples are drained on their own thread so the SUB queue never backs up
+    capture = CaptureEngine(data_address, context=context, sample_rate=sample_rate, rcvhwm=rcvhwm)
+    try:
+        capture.start()
+    except Exception:
+        detect_socket.close()
+        raise
+
+    if max_capture_seconds:
+        data_buffer = CaptureBuffer.for_duration(max_capture_seconds, sample_rate)
+    else:
+        data_buffer = CaptureBuffer(initial_capacity=int(sample_rate))
+
+    poller = zmq.Poller()
+    poller.register(detect_socket, zmq.POLLIN)
+
+    print("Monitoring for two-tone detection and data collection...")
+    detected = False
+    detection_time = None
+    try:
+        while True:
+            socks = dict(poller.poll(timeout=100))
+
+            if detect_socket in socks and socks[detect_socket] == zmq.POLLIN:
+                detect_signal = detect_socket.recv_string()
+
+                if detect_signal == "1" and not detected:
+                    detection_time = time.time()
+                    print(f"Two-Tone Detected at: {detection_time:.6f} seconds since epoch")
+                    tracing.instant("two_tone_detected")
+                    detected = True
+                    capture.start_recording()
+                    print("Polling ZMQ for data...")
+
+                if detect_signal == "0" and detected:
+                    print("Two-tone no longer detected. Stopping data collection.")
+                    capture.stop_recording()
+                    tracing.instant("two_tone_lost")
+                    with tracing.span("retransmit_hold", seconds=linger_after_loss):
+                        time.sleep(linger_after_loss)
+                    break
+
+            capture.drain_into(data_buffer)
+    finally:
+        capture.stop()
+        detect_socket.close()
+
+    capture.drain_into(data_buffer)
+    stats = capture.stats()
+    metrics.inc("airnode_capture_samples_total", stats["samples_received"])
+    metrics.inc("airnode_capture_samples_dropped_total", stats["samples_received"] - stats["samples_kept"])
+    metrics.inc("airnode_capture_samples_missing_total", stats["samples_missing"])
+    metrics.inc("airnode_capture_dropped_messages_total", stats["queue_dropped_messages"])
+    metrics.inc("airnode_capture_gaps_total", stats["gaps"])
+    print(f"Capture: {stats['samples_received']} samples received, "
+          f"{stats['samples_missing']} missing vs expected, "
+          f"{stats['queue_dropped_messages']} messages dropped, {stats['gaps']} gaps")
+    return data_buffer.to_array(), detection_time, stats
@@ -0,0 +1,84 @@
+"""
+command_dictionary.py
+
+Fuzzy correction of received command tokens (node IDs, Master/Slave/Idle)
+without running difflib on every line of every poll.
+
+A CommandDictionary accepts exactly what
+difflib.get_close_matches(word, vocabulary, n=1, cutoff) accepts. It answers
+from, in order:
+
+    table     every single-character substitution, deletion and insertion of
+              each vocabulary word, precomputed with difflib when the
+              dictionary is built (the usual RX corruption)
+    length    difflib's ratio is at most 2*min(len)/(len(a)+len(b)), so a
+              token whose length is too far from every word is rejected at once
+    memo      anything else is matched once with difflib and remembered
+
+A lookup is then a dict hit for nearly every token the RX produces.
+"""
+
+import difflib
+import string
+from functools import lru_cache
+
+ALPHABET = string.ascii_letters + string.digits + string.punctuation + " "
+MEMO_SIZE = 4096  # recent uncommon tokens kept per dictionary
+
+
+class CommandDictionary:
+    def __init__(self, vocabulary, cutoff=0.7, alphabet=ALPHABET):
+        self.vocabulary = tuple(sorted(set(vocabulary)))
+        self.cutoff = cutoff
+        self.lengths = sorted({len(word) for word in self.vocabulary})
+        self._memo = lru_cache(maxsize=MEMO_SIZE)(self._difflib_match)
+        self.table = {}
+        for word in self.vocabulary:
+            for variant in _single_edits(word, alphabet):
+                if variant not in self.table:
+                    self.table[variant] = self._difflib_match(variant)
+
+    def match(self, word):
+        """The vocabulary word word is a corrupted copy of, or None."""
+        try:
+            return self.table[word]
+        except KeyError:
+            pass
+        if not self._length_possible(len(word)):
+            return None
+        return self._memo(word)
+
+    __call__ = match
+
+    def _length_possible(self, n):
+        return any(2 * min(n, m) >= self.cutoff * (n + m) for m in self.lengths)
+
+    def _difflib_match(self, word):
+        match = difflib.get_close_matches(word, self.vocabulary, n=1, cutoff=self.cutoff)
+        return match[0] if match else None
+
+
+def _single_edits(word, alphabet):
+    yield word
+    for i in range(len(word) + 1):
+        for c in alphabet:
+            yield word[:i] + c + word[i:]
+        if i < len(word):
+            yield word[:i] + word[i + 1:]
+            for c in alphabet:
+                yield word[:i] + c + word[i + 1:]
+
+
+@lru_cache(maxsize=None)
+def _dictionary(vocabulary, cutoff):
+    return CommandDictionary(vocabulary, cutoff)
+
+
+def get_dictionary(vocabulary, cutoff=0.7):
+    """Shared dictionary for a vocabulary, built on first use."""
+    return _dictionary(frozenset(vocabulary), cutoff)
+
+
+def fuzzy_match(word, valid_set, cutoff=0.7):
+    """Drop-in replacement for the difflib one-liner: closest match in valid_set above cutoff, or None."""
+    return get_dictionary(valid_set, cutoff).match(word)
@@ -1,5 +1,8 @@
 import re
 import os
+import codecs
+import time
+import metrics
 
 def extract_command(input_path, output_path):
     if not os.path.exists(input_path):
@@ -32,3 +35,101 @@ def extract_command(input_path, output_path):
 
     print("No clean messages found between valid 512A blocks.")
     return False
+
+
+class CommandStreamExtractor:
+    """
+    Incremental version of extract_command for a file that keeps growing.
+
+    Remembers the byte offset it has read up to, the text after the last
+    complete pad block and how far into that text it has already searched, so
+    each poll only scans newly appended bytes. A command is emitted as soon as
+    the pad block that closes it is complete.
+    """
+
+    def __init__(self, input_path, pad_char='A', pad_len=512, inner_pad_len=10, max_frame_len=65536):
+        self.input_path = input_path
+        self.pad_char = pad_char
+        self.pad_re = re.compile(f"{re.escape(pad_char)}{{{pad_len},}}")
+        self.inner_pad_re = re.compile(f"{re.escape(pad_char)}{{{inner_pad_len},}}")
+        self.max_frame_len = max_frame_len
+        self.reset()
+
+    def reset(self):
+        """Forget all parser state, e.g. after the input file has been cleared."""
+        self.offset = 0
+        self.pending = ""
+        self.scan = 0  # index in pending to resume the pad search from (nothing before it starts a pad run)
+        self.opened = False  # True when pending starts right after a complete pad block
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+
+    def feed(self, text):
+        """Parses newly received text and returns the list of complete commands found in it."""
+        buf = self.pending + text
+        commands = []
+        pos = 0
+
+        for match in self.pad_re.finditer(buf, self.scan):
+            if match.end() == len(buf):
+                # The pad run may still be growing; rescan it once more data arrives
+                if not self.opened:
+                    pos = match.start()
+                resume = match.start()
+                break
+            if self.opened:
+                message = buf[pos:match.start()].strip()
+                if message and not self.inner_pad_re.search(message):
+                    commands.append(message)
+            self.opened = True
+            pos = match.end()
+        else:
+            # Only the trailing run of pad characters can still become a pad run
+            resume = len(buf)
+            while resume > pos and buf[resume - 1] == self.pad_char:
+                resume -= 1
+            if not self.opened:
+                # Nothing before it can belong to a command
+                pos = resume
+
+        self.pending = buf[pos:]
+        self.scan = resume - pos
+
+        # Noise without a closing pad: drop it and wait for the next opening pad
+        if len(self.pending) > self.max_frame_len:
+            tail = self.pending.rstrip(self.pad_char)
+            self.pending = self.pending[len(tail):]
+            self.scan = 0
+            self.opened = False
+
+        return commands
+
+    def flush(self):
+        """
+        Treats what has arrived so far as complete: a pad run at the very end of
+        the input (held back in case it was still growing) closes its command.
+        """
+        return self.feed("\n")
+
+    def poll(self):
+        """Reads bytes appended to input_path since the last call and returns new commands."""
+        try:
+            size = os.path.getsize(self.input_path)
+        except OSError:
+            return []
+
+        if size < self.offset:
+            # The file was truncated (cleared between protocol steps)
+            self.reset()
+        if size == self.offset:
+            return []
+
+        start = time.perf_counter()
+        with open(self.input_path, 'rb') as file:
+            file.seek(self.offset)
+            data = file.read(size - self.offset)
+        self.offset += len(data)
+
+        messages = self.feed(self.decoder.decode(data))
+        metrics.inc("airnode_parse_bytes_total", len(data), parser="padded")
+        metrics.inc("airnode_parse_seconds_total", time.perf_counter() - start, parser="padded")
+        return messages
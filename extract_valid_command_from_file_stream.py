@@ -1,8 +1,4 @@
-import difflib
-
-def fuzzy_match(word, valid_set, cutoff=0.7):
-    match = difflib.get_close_matches(word, valid_set, n=1, cutoff=cutoff)
-    return match[0] if match else None
+from command_dictionary import fuzzy_match
 
 def extract_valid_command_from_stream(filepath, save_path="command.txt"):
     VALID_DESTS = {"NodeG", "Node1", "Node2"}
@@ -0,0 +1,125 @@
+"""
+file_watch.py
+
+Event-driven waiting on files written by the GNU Radio RX flowgraphs (out.txt).
+
+FileWatcher blocks until the watched file changes instead of sleeping a fixed
+interval. On Linux it uses inotify on the parent directory (so the file may be
+created or truncated while watched); elsewhere it falls back to polling the
+file's size and mtime. The incremental parsers (extract_command.py,
+frame_format.py) read what was appended each time it wakes up.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+class FileWatcher:
+    """Wakes up when the watched file is created, written or replaced."""
+
+    def __init__(self, path, poll_interval=0.2):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(self.path).encode()
+        self.poll_interval = poll_interval
+        self.fd = None
+        self.last_stat = self._stat()
+
+        if _libc is not None:
+            fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+                directory = os.path.dirname(self.path).encode()
+                if _libc.inotify_add_watch(fd, directory, mask) >= 0:
+                    self.fd = fd
+                else:
+                    os.close(fd)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_size, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def _drain(self):
+        """Reads all queued inotify events and reports whether any were for our file."""
+        touched = False
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return touched
+            offset = 0
+            while offset < len(data):
+                _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b"\0")
+                offset += name_len
+                if name == self.name:
+                    touched = True
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the file changes or timeout seconds pass.
+        Returns True if a change was seen, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+
+            if self.fd is not None:
+                ready, _, _ = select.select([self.fd], [], [], remaining)
+                if ready and self._drain():
+                    return True
+            else:
+                time.sleep(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+                current = self._stat()
+                if current != self.last_stat:
+                    self.last_stat = current
+                    return True
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
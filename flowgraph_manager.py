@@ -0,0 +1,196 @@
+"""
+flowgraph_manager.py
+
+Runs the GRC-generated flowgraphs (BPSK_RX_NodeX.py, BPSK_TX_*.py, ack_tx.py,
+TwoToneTransciever.py, ...) inside the calling process.
+
+Each generated module is imported once and its top_block class cached, so a
+protocol step only pays for constructing the blocks and opening the LimeSDR,
+not for a new interpreter plus the GNU Radio / Qt imports. start() returns
+once top_block.start() has returned, and stop() returns once the flowgraph
+has fully stopped and released the device.
+
+attach_transceiver() goes one step further for a node: the flowgraphs that
+node_transceiver.py covers are then served as modes of one flowgraph that
+keeps the LimeSDR open, so starting one is a retune rather than a device open.
+
+If GNU Radio cannot be imported, or a generated .py is missing, the manager
+falls back to launching `python3 <name>.py` like before. A separate process
+gives no readiness signal, so start() then waits a fixed subprocess_startup
+grace period (returning early, with a message, if the process exits in it).
+Both kinds of handle expose poll()/terminate()/wait() like subprocess.Popen.
+"""
+
+import gc
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import tracing
+
+
+class FlowgraphHandle:
+    """A running in-process top block with a Popen-like interface."""
+
+    def __init__(self, name, top_block):
+        self.name = name
+        self.top_block = top_block
+        self.stopped = threading.Event()
+
+    def start(self):
+        self.top_block.start()
+
+    def poll(self):
+        return 0 if self.stopped.is_set() else None
+
+    def terminate(self):
+        if self.stopped.is_set():
+            return
+        self.top_block.stop()
+        self.top_block.wait()
+        self.stopped.set()
+        # Drop the blocks now so the SDR and any bound ZMQ ports are released
+        # before the next flowgraph opens them
+        self.top_block = None
+        gc.collect()
+
+    def wait(self, timeout=None):
+        self.stopped.wait(timeout)
+        return 0
+
+
+class FlowgraphManager:
+    """Imports generated flowgraphs once and starts/stops them in this process."""
+
+    def __init__(self, directory=None, in_process=True, subprocess_startup=2.0):
+        self.subprocess_startup = subprocess_startup
+        self.directory = os.path.abspath(directory or os.path.dirname(os.path.abspath(__file__)))
+        self.classes = {}
+        self.running = {}
+        self.lock = threading.Lock()
+        self.in_process = in_process and self._gnuradio_available()
+        self.qt_app = None
+        self.transceiver = None
+
+    @staticmethod
+    def _gnuradio_available():
+        try:
+            import gnuradio.gr  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _ensure_qt(self):
+        """The generated top blocks are qt_gui flowgraphs, which need a QApplication to exist."""
+        if self.qt_app is not None:
+            return
+        if not os.environ.get("DISPLAY"):
+            os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5 import Qt
+        self.qt_app = Qt.QApplication.instance() or Qt.QApplication(sys.argv[:1])
+
+    def load(self, name):
+        """Imports <name>.py once and returns its top block class (GRC names it after the file)."""
+        name = name[:-3] if name.endswith(".py") else name
+        if name not in self.classes:
+            if self.directory not in sys.path:
+                sys.path.insert(0, self.directory)
+            module = importlib.import_module(name)
+            self.classes[name] = getattr(module, name)
+        return self.classes[name]
+
+    def preload(self, names):
+        """Imports several flowgraphs up front (e.g. at node start-up) so the first start() is fast."""
+        if not self.in_process:
+            return
+        for name in names:
+            try:
+                self.load(name)
+            except (ImportError, AttributeError) as e:
+                print(f"Could not preload {name}: {e}")
+
+    def attach_transceiver(self, identifier, out_file="out.txt"):
+        """Opens the node's radio once in node_transceiver and serves its modes from start()/stop()."""
+        if not self.in_process or self.transceiver is not None:
+            return self.transceiver
+        self.stop_all()
+        from node_transceiver import node_transceiver
+        # Relative to the working directory, where the node reads it (one directory per simulated node)
+        self.transceiver = node_transceiver(identifier, out_file=os.path.abspath(out_file))
+        self.transceiver.start()
+        print(f"Transceiver flowgraph running for {identifier}.")
+        return self.transceiver
+
+    def start(self, name, **kwargs):
+        """
+        Starts a flowgraph and returns its handle once it is running.
+        Only one instance of each flowgraph runs at a time; starting a running one returns it.
+        """
+        name = name[:-3] if name.endswith(".py") else name
+        with tracing.span("flowgraph_start", flowgraph=name), self.lock:
+            handle = self.running.get(name)
+            if handle is not None and handle.poll() is None:
+                return handle
+
+            if self.transceiver is not None:
+                from node_transceiver import script_mode
+                if script_mode(name) is not None:
+                    handle = self.transceiver.activate(name)
+                    self.running[name] = handle
+                    return handle
+
+            script = os.path.join(self.directory, f"{name}.py")
+            if not self.in_process or not os.path.isfile(script):
+                handle = subprocess.Popen(["python3", script], cwd=self.directory)
+                # A separate interpreter gives no readiness signal; allow for imports and SDR open
+                try:
+                    code = handle.wait(timeout=self.subprocess_startup)
+                    print(f"{name}.py exited during start-up (code {code}).")
+                except subprocess.TimeoutExpired:
+                    pass
+            else:
+                self._ensure_qt()
+                handle = FlowgraphHandle(name, self.load(name)(**kwargs))
+                handle.start()
+            self.running[name] = handle
+            return handle
+
+    def stop(self, name_or_handle):
+        """Stops a flowgraph (by name or handle) and waits until it has released the radio."""
+        with tracing.span("flowgraph_stop"), self.lock:
+            if isinstance(name_or_handle, str):
+                name = name_or_handle[:-3] if name_or_handle.endswith(".py") else name_or_handle
+                handle = self.running.pop(name, None)
+            else:
+                handle = name_or_handle
+                for name, running in list(self.running.items()):
+                    if running is handle:
+                        del self.running[name]
+            if handle is not None and handle.poll() is None:
+                handle.terminate()
+                handle.wait()
+
+    def stop_all(self):
+        for name in list(self.running):
+            self.stop(name)
+
+    def close(self):
+        """Stops everything, including the transceiver, and releases the radio."""
+        self.stop_all()
+        if self.transceiver is not None:
+            self.transceiver.stop()
+            self.transceiver.wait()
+            self.transceiver = None
+            gc.collect()
+
+
+_default_manager = None
+
+
+def get_manager():
+    """The process-wide FlowgraphManager shared by the node, master and slave code."""
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = FlowgraphManager()
+    return _default_manager
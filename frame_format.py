@@ -0,0 +1,196 @@
+"""
+frame_format.py
+
+Self-delimiting binary frames for commands and data payloads.
+
+    offset  size  field
+    0       4     sync word 1A CF FC 1D
+    4       1     type (COMMAND, DATA)
+    5       1     source id
+    6       1     destination id
+    7       2     sequence number
+    9       4     payload length
+    13      2     header check (low 16 bits of the CRC32 of bytes 4..12)
+    15      n     payload
+    15+n    4     CRC32 of bytes 4..12 followed by the payload
+
+All fields are big-endian. The header check rejects a corrupted length before
+the decoder waits for a payload that will never arrive. The trailing CRC32
+rejects corrupted payloads, so no fuzzy matching is needed. Decoding
+searches for the sync word with bytes.find and then validates, which is a
+single O(n) pass. It needs no regex and no long runs of 'A' padding.
+"""
+
+import os
+import struct
+import time
+import zlib
+import metrics
+from collections import namedtuple
+
+SYNC = b"\x1a\xcf\xfc\x1d"
+TYPE_COMMAND = 1
+TYPE_DATA = 2
+
+# The ground is 0; NodeN is N (up to 255 nodes)
+NODE_IDS = {"NodeG": 0, "GROUND": 0}
+COMMANDS = ("Master", "Slave", "Idle")
+
+MAX_PAYLOAD = 16 << 20
+FRAME_PAD = 16  # 'A' fill the TX block puts around each repeat of a framed file
+
+_HEADER = struct.Struct(">4sBBBHI")
+_HCHECK = struct.Struct(">H")
+_CRC = struct.Struct(">I")
+HEADER_LEN = _HEADER.size + _HCHECK.size
+OVERHEAD = HEADER_LEN + _CRC.size
+
+Frame = namedtuple("Frame", ["type", "source", "destination", "payload", "seq"])
+Frame.__doc__ = "A decoded frame; encode_frame(*frame) rebuilds its bytes."
+
+
+def node_id(name):
+    if name in NODE_IDS:
+        return NODE_IDS[name]
+    number = name[4:] if name.startswith("Node") else ""
+    if not number.isdigit() or not 0 < int(number) < 256:
+        raise ValueError(f"Unknown node: {name}")
+    return int(number)
+
+
+def node_name(identifier):
+    return "NodeG" if identifier == 0 else f"Node{identifier}"
+
+
+def encode_frame(frame_type, source, destination, payload, seq=0):
+    """Builds one frame. source/destination are node names or ids; payload is bytes or str."""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload of {len(payload)} bytes exceeds {MAX_PAYLOAD}")
+    src = source if isinstance(source, int) else node_id(source)
+    dst = destination if isinstance(destination, int) else node_id(destination)
+    header = _HEADER.pack(SYNC, frame_type, src, dst, seq & 0xFFFF, len(payload))
+    header_crc = zlib.crc32(header[4:])
+    return header + _HCHECK.pack(header_crc & 0xFFFF) + payload + _CRC.pack(zlib.crc32(payload, header_crc))
+
+
+def encode_command(destination, command, source, seq=0):
+    return encode_frame(TYPE_COMMAND, source, destination, command.encode("ascii"), seq)
+
+
+def command_fields(frame):
+    """(command, destination, source) names for a COMMAND frame, or (None, None, None)."""
+    command = frame.payload.decode("ascii", errors="ignore")
+    if frame.type != TYPE_COMMAND or command not in COMMANDS:
+        return None, None, None
+    return command, node_name(frame.destination), node_name(frame.source)
+
+
+def is_framed(data):
+    return data[:len(SYNC)] == SYNC
+
+
+class FrameDecoder:
+    """Incremental decoder: feed() any chunk of received bytes, get back the complete valid frames in it."""
+
+    def __init__(self, max_payload=MAX_PAYLOAD):
+        self.max_payload = max_payload
+        self.reset()
+
+    def reset(self):
+        self.buffer = bytearray()
+        self.frames = 0
+        self.crc_errors = 0
+        self.header_errors = 0
+
+    def feed(self, data):
+        buf = self.buffer
+        buf += data
+        frames = []
+        pos = 0
+
+        while True:
+            start = buf.find(SYNC, pos)
+            if start < 0:
+                # Only a partial sync word at the very end can still matter
+                pos = max(pos, len(buf) - len(SYNC) + 1)
+                break
+            if len(buf) - start < HEADER_LEN:
+                pos = start
+                break
+
+            _, frame_type, src, dst, seq, length = _HEADER.unpack_from(buf, start)
+            (check,) = _HCHECK.unpack_from(buf, start + _HEADER.size)
+            header_crc = zlib.crc32(buf[start + 4:start + _HEADER.size])
+            if check != header_crc & 0xFFFF or length > self.max_payload:
+                self.header_errors += 1
+                pos = start + 1
+                continue
+
+            end = start + HEADER_LEN + length
+            if len(buf) < end + _CRC.size:
+                pos = start
+                break
+
+            payload = bytes(buf[start + HEADER_LEN:end])
+            (crc,) = _CRC.unpack_from(buf, end)
+            if crc != zlib.crc32(payload, header_crc):
+                self.crc_errors += 1
+                pos = start + 1
+                continue
+
+            frames.append(Frame(frame_type, src, dst, payload, seq))
+            self.frames += 1
+            pos = end + _CRC.size
+
+        del buf[:pos]
+        return frames
+
+
+def decode_frames(data):
+    """All valid frames in a complete buffer (e.g. a whole out.txt)."""
+    return FrameDecoder().feed(data)
+
+
+class FrameFileReader:
+    """
+    Decodes frames from a file that the RX flowgraph keeps appending to. Only
+    newly appended bytes are read on each poll(). A truncated file (cleared
+    between protocol steps) resets the decoder.
+    """
+
+    def __init__(self, path, max_payload=MAX_PAYLOAD):
+        self.path = path
+        self.decoder = FrameDecoder(max_payload)
+        self.offset = 0
+
+    def poll(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size < self.offset:
+            self.offset = 0
+            self.decoder.reset()
+        if size == self.offset:
+            return []
+        start = time.perf_counter()
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        self.offset += len(data)
+        frames = self.decoder.feed(data)
+        metrics.inc("airnode_parse_bytes_total", len(data), parser="frames")
+        metrics.inc("airnode_parse_seconds_total", time.perf_counter() - start, parser="frames")
+        return frames
+
+
+def frame_file(path, frame_type, source, destination, seq=0):
+    """Replaces the contents of path with one frame carrying them (what the TX block then repeats). Already framed files are left as they are."""
+    with open(path, "rb") as f:
+        payload = f.read()
+    if is_framed(payload):
+        return
+    with open(path, "wb") as f:
+        f.write(encode_frame(frame_type, source, destination, payload, seq))
@@ -0,0 +1,112 @@
+"""
+framing.py
+
+Single-pass parser for the padded transmissions the BPSK RX flowgraphs write
+to out.txt: payloads separated by runs of 'A' padding, with EOF_MARKERs at the
+end of data payloads.
+
+iter_frames walks the input once, in fixed-size chunks, and splits it the
+way the old parser did with split('A' * pad_len). It yields each non-empty
+segment as soon as the pad block that closes it is seen, so only the current
+segment is held in memory. It accepts a path, bytes
+or an mmap. Non-ASCII bytes (RX noise) are dropped first, the same way the
+ground's old .decode('ascii', errors='ignore') did, and segments are stripped
+of what str.strip() strips from ASCII text (including \x1c-\x1f). The node's
+old extractor decoded UTF-8 instead, which kept valid non-ASCII characters and
+also stripped Unicode whitespace such as U+00A0; here those bytes never reach
+a segment.
+"""
+
+import shutil
+from collections import namedtuple
+
+EOF_MARKER = b"EOF_MARKER"
+CHUNK_SIZE = 1 << 20
+_NON_ASCII = bytes(range(128, 256))
+# What str.strip() removes from ASCII text: bytes.strip() alone would keep \x1c-\x1f
+_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+Frame = namedtuple("Frame", ["data", "offset", "eof_markers"])
+Frame.__doc__ = "A stripped segment between pad runs, its offset in the (ASCII-filtered) stream and its EOF_MARKER count."
+
+
+def _chunks(source, chunk_size):
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+    else:
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start:start + chunk_size])
+
+
+def iter_frames(source, pad_char="A", pad_len=10, chunk_size=CHUNK_SIZE):
+    """
+    Yields a Frame for every non-empty segment of the input split on pad_char * pad_len,
+    like [s.strip() for s in text.split(pad_char * pad_len) if s.strip()] on the
+    ASCII-decoded input: a pad run uses up whole blocks of pad_len, and any pad_chars
+    left over stay in the segment.
+    """
+    pad_block = pad_char.encode("ascii") * pad_len
+    segment = bytearray()
+    segment_start = 0
+    consumed = 0  # ASCII-filtered bytes before `carry`
+    carry = b""
+
+    def emit(start):
+        data = bytes(segment).strip(_WHITESPACE)
+        if data:
+            return Frame(data, start, data.count(EOF_MARKER))
+        return None
+
+    for chunk in _chunks(source, chunk_size):
+        buf = carry + chunk.translate(None, _NON_ASCII)
+        pos = 0
+        while True:
+            # bytes.find locates the next pad block much faster than a regex scan
+            start = buf.find(pad_block, pos)
+            if start < 0:
+                break
+            segment += buf[pos:start]
+            frame = emit(segment_start)
+            if frame:
+                yield frame
+            segment.clear()
+            pos = start + pad_len
+            segment_start = consumed + pos
+
+        # Keep the last pad_len - 1 bytes back: a pad block may start in them and end in the next chunk
+        keep_from = max(pos, len(buf) - (pad_len - 1))
+        segment += buf[pos:keep_from]
+        carry = buf[keep_from:]
+        consumed += keep_from
+
+    segment += carry
+    frame = emit(segment_start)
+    if frame:
+        yield frame
+
+
+def middle_frame(source, pad_char="A", pad_len=10, chunk_size=CHUNK_SIZE):
+    """
+    The second segment of a padded start / middle / end transmission. Stops
+    reading once the third segment is complete (at the pad block that closes it),
+    so the rest of the file is never read. Raises ValueError if there are fewer
+    than three segments.
+    """
+    frames = []
+    for frame in iter_frames(source, pad_char, pad_len, chunk_size):
+        frames.append(frame)
+        if len(frames) == 3:
+            return frames[1]
+    raise ValueError("Expected at least three transmissions (padded start, middle, end).")
+
+
+def backup_file(input_file, backup_path):
+    """Streams a raw copy of input_file to backup_path (no decoding, constant memory)."""
+    shutil.copyfile(input_file, backup_path)
+    return backup_path
@@ -1,114 +1,339 @@
-import subprocess
+import argparse
+import os
 import time
-import zmq
+import metrics
+import tracing
+from extract_command import CommandStreamExtractor
+from file_watch import FileWatcher
+from framing import backup_file, middle_frame
+from reassembly import PacketVoter
+from master_schedule import PAIRINGS, SCHEDULES, PhaseTimer, pairwise_schedule, parse_result_header
+from ack_listener import AckListener
+from flowgraph_manager import get_manager
+from zmq_ports import ACK_PORT
+from frame_format import NODE_IDS, TYPE_DATA, FrameFileReader, encode_command, node_id
 
-nodes = ["Node1", "Node2", "Node3"]
-ZMQ_ACK_PORT = 4010
+nodes = ["Node1", "Node2", "Node3"]  # default mesh; --nodes overrides it
+ZMQ_ACK_PORT = ACK_PORT
+ACK_TIMEOUT = 60.0  # seconds to wait for the master's ACK per attempt
+ACK_ATTEMPTS = 3
+RECEIVE_TIMEOUT = 240.0  # seconds to wait for one slave result (the master measures the slave first)
+SLAVE_SCHEDULE = os.environ.get("AIRNODE_SLAVE_SCHEDULE", "sequential")  # the masters' slave_schedule; --schedule overrides it
+RECEIVE_ATTEMPTS = 2  # RX restarts before giving up on a slave
+DATA_PAD_LEN = 256  # 'A' run that brackets each uploaded frame
+MAX_FRAME_LEN = 4 << 20
+DATA_VOTES = 3  # the master uploads 3 copies; stop as soon as they agree
+RX_QUIET = 5.0  # seconds without a new copy before voting over what has arrived
+BACKUP_RAW = True  # keep a raw copy of out.txt for every pair
+COMBINED_FLOWGRAPH = os.environ.get("AIRNODE_DEVICE", "").startswith("sim:")  # simulated ground: serve flowgraphs from node_transceiver
+# CRC-checked frames (frame_format.py) instead of the padded text format; must match the nodes' binary_frames
+BINARY_FRAMES = os.environ.get("AIRNODE_BINARY_FRAMES", "").strip().lower() in ("1", "true", "yes", "on")
 
 def write_command_file(destination: str, command: str, source: str):
-    with open("command.txt", "w") as f:
-        f.write(f"{destination}\n{command}\n{source}")
+    if BINARY_FRAMES:
+        with open("command.txt", "wb") as f:
+            f.write(encode_command(destination, command, source))
+    else:
+        with open("command.txt", "w") as f:
+            f.write(f"{destination}\n{command}\n{source}")
     print(f"📄 Command file written: {destination} ← {command} from {source}")
 
-def wait_for_ack():
+def wait_for_ack(ack_listener, timeout=None):
     print(f"🟡 Waiting for ACK on port {ZMQ_ACK_PORT}...")
-    ctx = zmq.Context()
-    socket = ctx.socket(zmq.SUB)
-    socket.connect(f"tcp://localhost:{ZMQ_ACK_PORT}")
-    socket.setsockopt_string(zmq.SUBSCRIBE, "")
-    while True:
-        try:
-            msg = socket.recv_string(flags=zmq.NOBLOCK)
-            if msg.strip() == "1":
-                print("✅ ACK received.")
-                break
-        except zmq.Again:
-            time.sleep(0.1)
-
-def wait_for_eof_markers(file_path="out.txt"):
-    print(f"⏳ Waiting for 2 EOF_MARKERs in {file_path}...")
-    while True:
-        try:
-            with open(file_path, "rb") as f:
-                content = f.read()
-                count = content.count(b"EOF_MARKER")
-                print(f"🔍 EOF_MARKER count: {count}")
-                if count >= 2:
-                    print("✅ 2 EOF_MARKERs detected.")
-                    break
-        except FileNotFoundError:
-            print("⚠️  out.txt not found yet...")
-        time.sleep(0.5)
-
-def extract_middle_segment(input_file: str, output_file: str, master: str = "", slave: str = "", pad_char='A', pad_len=10):
-    with open(input_file, 'rb') as f:
-        content = f.read()
-
-    # Save full unmodified content as backup
-    backup_file = f"backup_{master}_{slave}.txt"
-    with open(backup_file, 'wb') as f_backup:
-        f_backup.write(content)
-    print(f"📁 Full backup saved to {backup_file}")
-
-    decoded = content.decode('ascii', errors='ignore')
-    parts = [s.strip() for s in decoded.split(pad_char * pad_len) if s.strip()]
-    if len(parts) < 3:
-        raise ValueError("Expected at least 3 padded sections in the file.")
-
-    with open(output_file, 'w') as f:
-        f.write(parts[1])
+    if ack_listener.wait_for_ack(timeout):
+        print("✅ ACK received.")
+        return True
+    print("⌛ No ACK before timeout.")
+    return False
+
+def extract_middle_segment(input_file: str, output_file: str, master: str = "", slave: str = "", pad_char='A', pad_len=10,
+                           backup: bool = True):
+    # Optional raw copy of the full capture (streamed, never decoded)
+    if backup:
+        backup_path = backup_file(input_file, f"backup_{master}_{slave}.txt")
+        print(f"📁 Full backup saved to {backup_path}")
+
+    # Stops reading once the segment after the middle one starts
+    frame = middle_frame(input_file, pad_char, pad_len)
+    with open(output_file, 'wb') as f:
+        f.write(frame.data)
     print(f"📁 Extracted segment saved to {output_file}")
 
-def send_ack():
+def send_ack(flowgraphs):
     print("📡 Sending ACK to Master...")
-    ack_proc = subprocess.Popen(["python3", "ack_tx.py"])
-    time.sleep(3)
-    ack_proc.terminate()
-    ack_proc.wait()
+    with tracing.span("ack_tone", hold=3):
+        ack_proc = flowgraphs.start("ack_tx.py")
+        time.sleep(3)
+        flowgraphs.stop(ack_proc)
     print("✅ ACK sent.")
 
-def receive_slave_data(rx_script: str, master: str, slave: str):
-    open("out.txt", "w").close()
-    print("🧹 Cleared out.txt before receiving data.")
+class GroundSequencer:
+    """
+    Event-driven master cycle. Each stage has its own timeout/retry budget and its latency is logged:
+
+        command  -> Master command TX until the master ACKs
+        receive  -> RX runs right away; done when a data frame from the master to the ground passes
+                    its CRC (or, unframed, when a complete padded copy ending in EOF_MARKER arrives)
+        save     -> frame written to <master><slave>.txt (+ raw backup); the slave comes from the
+                    result's "# Slave:" line, and a "# Skipped:" result is only recorded
+        ack      -> ACK tone to the master, then back to receive while slaves are outstanding
+
+    With the "deferred" schedule the master measures every slave before uploading anything,
+    so the first result gets RECEIVE_TIMEOUT per outstanding slave, and once every slave is
+    received or given up the ground listens once more for the ones it gave up on. A result
+    that arrives after the ground gave up on its slave is saved either way.
+    """
+
+    def __init__(self, master, rx_script="BPSK_RX_DATA_GROUND.py", timer=None, slaves=None, schedule=None,
+                 ack_listener=None, flowgraphs=None):
+        self.master = master
+        # Opened here rather than at import, so importing the module binds no sockets
+        self.ack_listener = ack_listener or AckListener(f"tcp://localhost:{ZMQ_ACK_PORT}")
+        self.flowgraphs = flowgraphs or get_manager()
+        self.rx_script = rx_script
+        self.slaves = [n for n in nodes if n != master] if slaves is None else list(slaves)
+        self.schedule = schedule or SLAVE_SCHEDULE
+        if self.schedule not in SCHEDULES:
+            raise ValueError(f"Unknown schedule {self.schedule!r}; expected one of {SCHEDULES}")
+        self.timer = timer or PhaseTimer()
+        self.given_up = []  # slaves whose result did not arrive in time (a late upload is still saved)
+        self.uploads = 0  # frames received from the master this cycle
+        self.results = {}
+        self.frame = None
+        self.slave = None  # the slave the received frame belongs to
+        self.state = "command"
+
+    def run(self):
+        """Runs the cycle to completion. Returns {slave: received (bool)}."""
+        handlers = {"command": self.command, "receive": self.receive, "save": self.save, "ack": self.ack}
+        while self.state not in ("done", "failed"):
+            stage, pair = self.state, self.pair()
+            tracing.set_context(slave=self.current_slave())
+            metrics.set_state(stage)
+            with self.timer.phase(stage, pair):
+                next_state = handlers[stage]()
+            print(f"⏱️ {stage} ({pair}) took {self.timer.records[-1][2]:.2f} s")
+            self.state = next_state
+        metrics.set_state(self.state)
+        return self.results
+
+    def current_slave(self):
+        """The slave of the frame in hand, else the next one expected (a hint: results may arrive in any order)."""
+        if self.state == "command":
+            return None
+        waiting = self.waiting_for()
+        return self.slave or (waiting[0] if waiting else None)
+
+    def pair(self):
+        slave = self.current_slave()
+        return f"{self.master}{slave}" if slave else self.master
+
+    def command(self):
+        write_command_file(self.master, "Master", "NodeG")
+        tx_script = f"BPSK_TX_{self.master}.py"
+
+        def start_tx():
+            print(f"🚀 Launching {tx_script}...")
+            print(f"🟡 Waiting for ACK on port {ZMQ_ACK_PORT}...")
+            return self.flowgraphs.start(tx_script)
+
+        def stop_tx(tx_proc):
+            self.flowgraphs.stop(tx_proc)
+            print(f"🛑 TX {tx_script} terminated.")
+
+        acked = self.ack_listener.wait_for_ack_with_retry(
+            start_tx, stop_tx, timeout=ACK_TIMEOUT, attempts=ACK_ATTEMPTS,
+            on_retry=lambda attempt: print(f"🔁 No ACK from {self.master} (attempt {attempt}). Retrying..."))
+        if not acked:
+            print(f"❌ {self.master} never acknowledged the Master command. Skipping it.")
+            return "failed"
+        print("✅ ACK received.")
+        return "receive" if self.slaves else "done"
+
+    def receive_timeout(self):
+        """Seconds to wait for the next result: deferred masters upload only once every slave is measured."""
+        if self.schedule == "deferred" and not self.uploads:
+            return RECEIVE_TIMEOUT * len(self.slaves)
+        return RECEIVE_TIMEOUT
 
-    print(f"🔻 Receiving from {master} → {slave}...")
-    rx_proc = subprocess.Popen(["python3", rx_script])
-    wait_for_eof_markers()
-    rx_proc.terminate()
-    rx_proc.wait()
+    def waiting_for(self):
+        """Slaves whose result can still arrive: the outstanding ones, then (deferred) the given-up ones."""
+        if self.slaves:
+            return self.slaves
+        return self.given_up if self.schedule == "deferred" else []
 
-    output_file = f"{master}{slave}.txt"
-    extract_middle_segment("out.txt", output_file, master, slave)
-    send_ack()
+    def next_state(self):
+        return "receive" if self.waiting_for() else "done"
 
+    def receive(self):
+        timeout = self.receive_timeout()
+        waiting = self.waiting_for()
+        for attempt in range(1, RECEIVE_ATTEMPTS + 1):
+            print(f"🔻 Receiving from {self.master} (waiting for {', '.join(waiting)}; attempt {attempt})...")
+            self.frame = receive_frame(self.flowgraphs, self.rx_script, timeout, self.master)
+            if self.frame is not None:
+                self.uploads += 1
+                slave, skipped = parse_result_header(self.frame)
+                # Results from masters without the header arrive in schedule order
+                self.slave = slave or waiting[0]
+                if self.slave not in self.slaves and self.slave not in self.given_up:
+                    # Already saved: the master missed our ACK and sent it again
+                    print(f"🔁 {self.master} → {self.slave} was already received. ACKing again.")
+                    return "ack"
+                if skipped:
+                    print(f"⏭️ {self.master} skipped {self.slave}: {skipped}")
+                    self.results[self.slave] = False
+                    self.forget(self.slave)
+                    return "ack"
+                return "save"
+            print(f"⌛ No complete frame from {self.master} within {timeout:.0f} s.")
+        if not self.slaves:
+            print(f"❌ No late results from {self.master} for {', '.join(self.given_up)}.")
+            self.given_up.clear()
+            return "done"
+        slave = self.slaves.pop(0)
+        print(f"❌ Giving up on {self.master} → {slave}.")
+        self.results[slave] = False
+        self.given_up.append(slave)
+        return self.next_state()
+
+    def forget(self, slave):
+        """Takes slave off the outstanding (or given-up) list once its result is handled."""
+        if slave in self.slaves:
+            self.slaves.remove(slave)
+        elif slave in self.given_up:
+            self.given_up.remove(slave)
+
+    def save(self):
+        slave = self.slave
+        output_file = f"{self.master}{slave}.txt"
+        if BACKUP_RAW:
+            backup_path = backup_file("out.txt", f"backup_{self.master}_{slave}.txt")
+            print(f"📁 Full backup saved to {backup_path}")
+        with open(output_file, "w") as f:
+            f.write(self.frame)
+        print(f"📁 Extracted segment saved to {output_file}")
+        if slave in self.given_up:
+            print(f"📥 Late result for {self.master} → {slave} saved.")
+        self.results[slave] = True
+        self.forget(slave)
+        return "ack"
+
+    def ack(self):
+        send_ack(self.flowgraphs)
+        open("out.txt", "w").close()
+        print("🧹 Cleared out.txt after saving data.")
+        self.frame = None
+        self.slave = None
+        return self.next_state()
+
+def receive_frame(flowgraphs, rx_script: str, timeout: float, master: str = None):
+    """
+    Runs RX until the master's data arrives. With BINARY_FRAMES, that is the first data frame
+    from master (any node if None) addressed to the ground that passes its CRC. Otherwise it
+    collects complete copies (between 'A' pad runs, ending in EOF_MARKER) and returns the byte-wise majority vote as soon as
+    DATA_VOTES copies agree, or the best vote once the master has gone quiet for RX_QUIET seconds.
+    None if nothing arrives within timeout.
+    """
     open("out.txt", "w").close()
-    print("🧹 Cleared out.txt after saving data.")
+    if BINARY_FRAMES:
+        return receive_data_frame(flowgraphs, rx_script, timeout, master)
+    extractor = CommandStreamExtractor("out.txt", pad_len=DATA_PAD_LEN, max_frame_len=MAX_FRAME_LEN)
+    voter = PacketVoter(min_repeats=DATA_VOTES, accept=lambda copy: b"EOF_MARKER" in copy)
+    deadline = time.monotonic() + timeout
+    last_copy = None
+    rx_proc = flowgraphs.start(rx_script)
+    try:
+        with tracing.span("data_wait"), FileWatcher("out.txt") as watcher:
+            while True:
+                for frame in extractor.poll():
+                    if "EOF_MARKER" not in frame:
+                        print("🔍 Incomplete frame ignored.")
+                        continue
+                    last_copy = time.monotonic()
+                    if voter.add(frame):
+                        payload, _ = voter.result()
+                        print(f"🗳️ {voter.copies} copies agree.")
+                        return payload.decode("utf-8", errors="ignore")
+                now = time.monotonic()
+                if last_copy is not None and now - last_copy >= RX_QUIET:
+                    # The last copy is only closed by its footer; nothing follows it once the master stops
+                    for frame in extractor.flush():
+                        if "EOF_MARKER" in frame:
+                            voter.add(frame)
+                    payload, agreement = voter.result(force=True)
+                    print(f"🗳️ Best vote over {voter.copies} copies (worst byte agreement {agreement:.0%}).")
+                    return payload.decode("utf-8", errors="ignore")
+                if now >= deadline:
+                    return None
+                watcher.wait(timeout=min(deadline - now, 1))
+    finally:
+        flowgraphs.stop(rx_proc)
 
-def main():
-    for master in nodes:
+def receive_data_frame(flowgraphs, rx_script: str, timeout: float, master: str = None):
+    source = None if master is None else node_id(master)
+    reader = FrameFileReader("out.txt", max_payload=MAX_FRAME_LEN)
+    deadline = time.monotonic() + timeout
+    rx_proc = flowgraphs.start(rx_script)
+    try:
+        with tracing.span("data_wait"), FileWatcher("out.txt") as watcher:
+            while True:
+                for frame in reader.poll():
+                    if frame.type == TYPE_DATA and frame.destination == NODE_IDS["NodeG"]:
+                        if source is not None and frame.source != source:
+                            print(f"🔍 Data frame from node {frame.source} ignored (expecting {master}).")
+                            continue
+                        print(f"✅ Data frame #{frame.seq} passed CRC ({len(frame.payload)} bytes).")
+                        return frame.payload.decode("utf-8", errors="ignore")
+                now = time.monotonic()
+                if now >= deadline:
+                    errors = reader.decoder.crc_errors + reader.decoder.header_errors
+                    if errors:
+                        print(f"🔍 {errors} corrupted frames dropped.")
+                    return None
+                watcher.wait(timeout=min(deadline - now, 1))
+    finally:
+        flowgraphs.stop(rx_proc)
+
+def main(mesh=None, pairing="ordered", schedule=None):
+    mesh = mesh or nodes
+    ack_listener = AckListener(f"tcp://localhost:{ZMQ_ACK_PORT}")
+    flowgraphs = get_manager()
+    if COMBINED_FLOWGRAPH:
+        flowgraphs.attach_transceiver("GROUND")
+    else:
+        flowgraphs.preload(["ack_tx", "BPSK_RX_DATA_GROUND"] + [f"BPSK_TX_{n}" for n in mesh])
+    open("out.txt", "w").close()
+    print("🧹 Cleared out.txt at startup.")
+
+    timer = PhaseTimer()
+    for round_number, (master, slaves) in enumerate(pairwise_schedule(mesh, pairing), 1):
+        tracing.set_context(round=round_number, master=master)
         print(f"\n==============================")
         print(f"🎯 Assigning Master: {master}")
         print(f"==============================")
+        results = GroundSequencer(master, timer=timer, slaves=slaves, schedule=schedule,
+                                  ack_listener=ack_listener, flowgraphs=flowgraphs).run()
+        print(f"📊 {master}: {sum(results.values())}/{len(results)} slave results received.")
 
-        write_command_file(master, "Master", "NodeG")
-
-        tx_script = f"BPSK_TX_{master}.py"
-        print(f"🚀 Launching {tx_script}...")
-        tx_proc = subprocess.Popen(["python3", tx_script])
-        wait_for_ack()
-        tx_proc.terminate()
-        tx_proc.wait()
-        print(f"🛑 TX {tx_script} terminated after ACK.")
-
-        slave_targets = [n for n in nodes if n != master]
-        for slave in slave_targets:
-            time.sleep(35)
-            receive_slave_data("BPSK_RX_DATA_GROUND.py", master, slave)
-
+    timer.report("📊")
     print("\n🎉 All Master cycles completed successfully.")
 
 if __name__ == "__main__":
-    open("out.txt", "w").close()
-    print("🧹 Cleared out.txt at startup.")
-    main()
+    parser = argparse.ArgumentParser(description="Ground station: runs a master cycle for every air node.")
+    parser.add_argument("--nodes", default=",".join(nodes), help="comma-separated air nodes (same list as the nodes use)")
+    parser.add_argument("--pairing", choices=PAIRINGS, default="ordered")
+    parser.add_argument("--schedule", choices=SCHEDULES, default=SLAVE_SCHEDULE,
+                        help="the masters' slave_schedule (default $AIRNODE_SLAVE_SCHEDULE or sequential)")
+    parser.add_argument("--trace", help="write a span trace of the run to this JSONL file (default $AIRNODE_TRACE)")
+    parser.add_argument("--metrics-port", type=int, help="serve /metrics on this local port (default $AIRNODE_METRICS_PORT)")
+    parser.add_argument("--binary-frames", action="store_true",
+                        help="speak CRC-checked frames instead of padded text (default $AIRNODE_BINARY_FRAMES)")
+    args = parser.parse_args()
+    BINARY_FRAMES = BINARY_FRAMES or args.binary_frames
+    mesh = [n.strip() for n in args.nodes.split(",") if n.strip()]
+    tracing.configure(args.trace, node="GROUND")
+    metrics.serve(args.metrics_port, node="GROUND")
+    metrics.watch_file("out.txt")
+    main(mesh, args.pairing, args.schedule)
 
@@ -0,0 +1,125 @@
+"""
+iq_capture.py
+
+Binary storage for IQ captures.
+
+A capture is a raw complex64 sample file plus a small JSON sidecar holding the
+metadata that used to be written as '#' lines at the end of the text dumps:
+
+    two_tone_master_data.npy   complex64 samples (NumPy .npy, memory-mappable)
+    two_tone_master_data.json  transmit/detect time, tones, shift, carrier, ...
+
+Raw GNU Radio style .cfile/.bin files (headerless complex64) are read the same
+way. The old "real imag" text format is only produced by export_text (it is
+what gets sent to the ground over BPSK) and is still readable with load_text.
+"""
+
+import json
+import os
+import numpy as np
+
+SAMPLE_DTYPE = np.complex64
+TEXT_DTYPE = np.complex128  # parsed text keeps the precision the old loaders gave
+RAW_EXTENSIONS = (".cfile", ".bin", ".fc32")
+
+# Metadata keys and the '#' lines they become in text exports, in file order
+TEXT_METADATA = [
+    ("transmit_time", "Two-Tone Originally Transmitted at", lambda v: f"{v:.6f} seconds since epoch"),
+    ("detect_time", "Two-Tone Detected at", lambda v: f"{v:.6f} seconds since epoch"),
+    ("detected_freqs", "Detected Baseband Frequencies", lambda v: f"{v[0]:.2f} Hz, {v[1]:.2f} Hz"),
+    ("expected_freqs", "Expected Baseband Frequencies", lambda v: f"{v[0]:.2f} Hz, {v[1]:.2f} Hz"),
+    ("frequency_shift", "Frequency Shift", lambda v: f"{v:.2f} Hz"),
+    ("carrier_frequency", "Estimated Carrier Frequency", lambda v: f"{v:.2f} Hz"),
+]
+
+
+def sidecar_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def save_capture(path, samples, metadata=None):
+    """
+    Writes samples as complex64 to path (.npy, or raw for .cfile/.bin/.fc32)
+    and metadata to the JSON sidecar next to it.
+    """
+    samples = np.asarray(samples, dtype=SAMPLE_DTYPE)
+    if path.endswith(RAW_EXTENSIONS):
+        samples.tofile(path)
+    else:
+        np.save(path, samples)
+
+    sidecar = {key: _to_json(value) for key, value in (metadata or {}).items()}
+    sidecar["num_samples"] = len(samples)
+    sidecar["dtype"] = "complex64"
+    with open(sidecar_path(path), "w") as f:
+        json.dump(sidecar, f, indent=2)
+
+
+def load_metadata(path):
+    """Returns the sidecar metadata for a capture, or {} if there is none."""
+    try:
+        with open(sidecar_path(path), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def load_capture(path, mmap=True, text_dtype=TEXT_DTYPE):
+    """
+    Returns (samples, metadata) for a capture file.
+    Binary captures are memory-mapped read-only by default, so nothing is copied
+    until the samples are used. Text files are parsed with load_text into text_dtype.
+    """
+    if path.endswith(".npy"):
+        samples = np.load(path, mmap_mode="r" if mmap else None)
+    elif path.endswith(RAW_EXTENSIONS):
+        samples = np.memmap(path, dtype=SAMPLE_DTYPE, mode="r") if mmap else np.fromfile(path, dtype=SAMPLE_DTYPE)
+    else:
+        return load_text(path, text_dtype), {}
+    return samples, load_metadata(path)
+
+
+def load_text(path, dtype=TEXT_DTYPE):
+    """
+    Parses a legacy "real imag" text dump, skipping '#' lines and corrupted lines.
+    Complex128 by default, like the old loaders; pass SAMPLE_DTYPE to halve the memory.
+    """
+    iq = []
+    with open(path, "r", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            try:
+                iq.append(complex(float(parts[0]), float(parts[1])))
+            except ValueError:
+                continue
+    return np.array(iq, dtype=dtype)
+
+
+def export_text(path, samples, metadata=None, max_samples=None):
+    """
+    Writes the legacy text format: one "real imag" line per sample (at most
+    max_samples of them), then a blank line and the '#' metadata lines.
+    """
+    samples = np.asarray(samples)[:max_samples]
+    metadata = metadata or {}
+    with open(path, "w") as f:
+        if len(samples):
+            pairs = np.column_stack((samples.real, samples.imag))
+            np.savetxt(f, pairs, fmt="%.6f", delimiter=" ")
+        f.write("\n")
+        for key, label, fmt in TEXT_METADATA:
+            if metadata.get(key) is not None:
+                f.write(f"# {label}: {fmt(metadata[key])}\n")
@@ -0,0 +1,201 @@
+"""
+master_schedule.py
+
+Orders the per-slave steps of a master cycle and times each of them.
+
+A master cycle runs these steps for every slave:
+
+    command   Slave command TX until the slave ACKs
+    two_tone  two-tone exchange (master_mode)
+    receive   BPSK RX of the slave's measurement (skipped after data_timeout)
+    ack       ACK tone to the slave
+    extract   strip the padding and append the master's own measurement
+    upload    BPSK TX of the result to the ground until it ACKs
+
+There is one radio, so the on-air steps cannot overlap. The scheduler can
+defer the uploads so that every slave is measured first. Uploads then go
+out back to back, while the ground is already listening.
+
+Schedules:
+    "sequential"  upload each slave's result right after measuring it (original order)
+    "deferred"    measure every slave first, then upload all results together
+
+pairwise_schedule derives which slaves each master measures for any number of
+nodes, so the ground and every node agree on it without a hand-written list.
+
+Pairings:
+    "ordered"    every node measures every other node (both directions of each pair)
+    "unordered"  each pair is measured once, by the node that comes first in the list
+
+Every result uploaded to the ground starts with a "# Slave: <node>" line, so
+the ground files it under the right pair whatever order it arrives in. A slave
+the master had to skip (no ACK, no data) is still reported, with a
+"# Skipped: <reason>" line and no data, so the ground does not wait for it.
+"""
+
+import time
+import tracing
+
+SCHEDULES = ("sequential", "deferred")
+PAIRINGS = ("ordered", "unordered")
+RESULT_SLAVE = "# Slave: "
+RESULT_SKIPPED = "# Skipped: "
+
+
+def pairwise_schedule(nodes, pairing="ordered"):
+    """[(master, [slaves])] for every node in order."""
+    if pairing not in PAIRINGS:
+        raise ValueError(f"Unknown pairing {pairing!r}; expected one of {PAIRINGS}")
+    nodes = list(nodes)
+    if pairing == "ordered":
+        return [(master, [n for n in nodes if n != master]) for master in nodes]
+    return [(master, nodes[i + 1:]) for i, master in enumerate(nodes)]
+
+
+def slaves_of(master, nodes, pairing="ordered"):
+    return dict(pairwise_schedule(nodes, pairing)).get(master, [])
+
+
+def result_header(slave, skipped=None):
+    """The lines that start a result uploaded to the ground."""
+    header = f"{RESULT_SLAVE}{slave}\n"
+    if skipped:
+        header += f"{RESULT_SKIPPED}{skipped}\n"
+    return header
+
+
+def parse_result_header(text):
+    """(slave, skip reason or None) of an uploaded result; (None, None) if it has no header (older masters)."""
+    slave = skipped = None
+    for line in text.lstrip().splitlines()[:2]:
+        if line.startswith(RESULT_SLAVE):
+            slave = line[len(RESULT_SLAVE):].strip()
+        elif line.startswith(RESULT_SKIPPED):
+            skipped = line[len(RESULT_SKIPPED):].strip()
+    return slave, skipped
+
+
+class PhaseTimer:
+    """Records how long each named phase took, per target. Each phase is also a tracing span."""
+
+    def __init__(self):
+        self.records = []  # (target, phase, seconds)
+        self.started = time.monotonic()
+
+    def phase(self, name, target=None):
+        return _Phase(self, name, target)
+
+    def total(self, name=None):
+        return sum(seconds for _, phase, seconds in self.records if name is None or phase == name)
+
+    def report(self, label="[Master]"):
+        """Prints every phase and the cycle total; returns the records."""
+        print(f"{label} Phase timings:")
+        for target, phase, seconds in self.records:
+            print(f"  {target or '-':>8} {phase:<10} {seconds:8.2f} s")
+        phases = dict.fromkeys(phase for _, phase, _ in self.records)
+        for phase in phases:
+            print(f"  {'total':>8} {phase:<10} {self.total(phase):8.2f} s")
+        print(f"{label} Cycle time: {time.monotonic() - self.started:.2f} s")
+        return self.records
+
+
+class _Phase:
+    def __init__(self, timer, name, target):
+        self.timer = timer
+        self.name = name
+        self.target = target
+
+    def __enter__(self):
+        self.span = tracing.span(self.name, target=self.target)
+        self.span.__enter__()
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.records.append((self.target, self.name, time.monotonic() - self.start))
+        self.span.__exit__(*exc)
+        return False
+
+
+class MasterScheduler:
+    """
+    Runs a master cycle over targets using the node's step methods:
+    command_slave, run_two_tone, receive_slave_data, send_ack,
+    extract_slave_data, upload_to_ground and report_skipped.
+    """
+
+    def __init__(self, node, targets, schedule="sequential", timer=None):
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Unknown schedule {schedule!r}; expected one of {SCHEDULES}")
+        self.node = node
+        self.targets = list(targets)
+        self.schedule = schedule
+        self.timer = timer or PhaseTimer()
+
+    def run(self):
+        """Returns {target: uploaded (bool)}; skipped slaves are False (and reported to the ground)."""
+        node, timer = self.node, self.timer
+        results = {}
+        pending = []
+
+        for target in self.targets:
+            tracing.set_context(slave=target)
+            with timer.phase("command", target):
+                acked = node.command_slave(target)
+            if not acked:
+                self._skip(target, "no ACK to the Slave command", results, pending)
+                continue
+
+            with timer.phase("two_tone", target):
+                node.run_two_tone()
+            with timer.phase("receive", target):
+                received = node.receive_slave_data(target)
+            if not received:
+                print(f"No data from {target}. Skipping it.")
+                self._skip(target, "no data received", results, pending)
+                continue
+
+            with timer.phase("ack", target):
+                node.send_ack()
+            try:
+                data_file = self._timed_extract(target)
+            except ValueError as e:
+                print(f"Could not extract {target}'s data: {e}")
+                self._skip(target, f"could not extract its data ({e})", results, pending)
+                continue
+
+            if self.schedule == "sequential":
+                results[target] = self._upload(target, data_file)
+            else:
+                pending.append((target, data_file, None))
+
+        for target, data_file, skipped in pending:
+            if skipped:
+                self._report_skipped(target, skipped)
+            else:
+                results[target] = self._upload(target, data_file)
+
+        timer.report()
+        return results
+
+    def _skip(self, target, reason, results, pending):
+        results[target] = False
+        if self.schedule == "sequential":
+            self._report_skipped(target, reason)
+        else:
+            pending.append((target, None, reason))
+
+    def _report_skipped(self, target, reason):
+        tracing.set_context(slave=target)
+        with self.timer.phase("upload", target):
+            return self.node.report_skipped(target, reason)
+
+    def _timed_extract(self, target):
+        with self.timer.phase("extract", target):
+            return self.node.extract_slave_data(f"Data_{target}.txt", target)
+
+    def _upload(self, target, data_file):
+        tracing.set_context(slave=target)
+        with self.timer.phase("upload", target):
+            return self.node.upload_to_ground(data_file)
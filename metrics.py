@@ -0,0 +1,244 @@
+"""
+metrics.py
+
+Health and radio-pipeline metrics for an air node or the ground, served on a
+local HTTP endpoint in the Prometheus text format:
+
+    python3 air_node.py --id Node2 --metrics-port 9102     (or AIRNODE_METRICS_PORT)
+    python3 ground_sc.py --metrics-port 9100
+    curl -s localhost:9102/metrics
+
+The code records into one process-wide Registry through the module
+functions (inc, observe, set_state, watch_file). Recording is a dict
+update under a lock, and it happens whether or not a server is running.
+The server is a daemon thread that renders the registry on each request.
+Some values are computed when a request arrives:
+- the size and growth rate of the watched files (out.txt)
+- time in the current state
+- process CPU time and RSS
+
+Metrics:
+    airnode_state{state}                              1 for the current state
+    airnode_state_seconds_total{state}                time spent in each state
+    airnode_ack_wait_seconds{acked}                   summary of ACK waits
+    airnode_fft_seconds{role}                         summary of two-tone analyses
+    airnode_file_bytes{path}                          size of each watched file
+    airnode_file_growth_bytes_per_second{path}        growth since the previous request
+    airnode_parse_bytes_total{parser}                 bytes read by the RX parsers
+    airnode_parse_seconds_total{parser}               time spent in them (throughput = bytes / seconds)
+    airnode_capture_samples_total                     two-tone samples received on the ZMQ sample socket
+    airnode_capture_samples_dropped_total             received samples dropped because the capture queue was full
+    airnode_capture_samples_missing_total             samples expected from the sample rate but not received
+    airnode_capture_dropped_messages_total            sample messages dropped because the capture queue was full
+    airnode_capture_gaps_total                        arrival gaps in the sample stream
+    process_cpu_seconds_total, process_resident_memory_bytes
+"""
+
+import os
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT_ENV = "AIRNODE_METRICS_PORT"
+
+# name -> (type, help)
+METRICS = {
+    "airnode_state": ("gauge", "1 for the current state of the node or ground sequencer."),
+    "airnode_state_seconds_total": ("counter", "Seconds spent in each state."),
+    "airnode_ack_wait_seconds": ("summary", "Time spent waiting for ACK tones, by outcome."),
+    "airnode_fft_seconds": ("summary", "Two-tone analysis (FFT) time."),
+    "airnode_file_bytes": ("gauge", "Size of the watched RX output files."),
+    "airnode_file_growth_bytes_per_second": ("gauge", "Growth of the watched files since the previous scrape."),
+    "airnode_parse_bytes_total": ("counter", "Bytes read by the RX parsers."),
+    "airnode_parse_seconds_total": ("counter", "Seconds spent in the RX parsers."),
+    "airnode_capture_samples_total": ("counter", "Two-tone samples received from the ZMQ sample socket."),
+    "airnode_capture_samples_dropped_total": ("counter", "Received samples dropped because the capture queue was full."),
+    "airnode_capture_samples_missing_total": ("counter", "Samples the sample rate says should have arrived but did not."),
+    "airnode_capture_dropped_messages_total": ("counter", "Sample messages dropped because the capture queue was full."),
+    "airnode_capture_gaps_total": ("counter", "Arrival gaps in the sample stream."),
+    "process_cpu_seconds_total": ("counter", "User and system CPU time of this process."),
+    "process_resident_memory_bytes": ("gauge", "Resident set size of this process."),
+    "process_max_resident_memory_bytes": ("gauge", "Peak resident set size of this process."),
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _value(value):
+    """A sample value at full precision (repr round-trips floats), with Prometheus' names for the specials."""
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _rss_bytes():
+    """Current RSS from /proc (Linux); the peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Registry:
+    """Counters, gauges and summaries keyed by (name, labels)."""
+
+    def __init__(self, labels=None):
+        self.lock = threading.Lock()
+        self.labels = dict(labels or {})  # added to every sample, e.g. node="Node2"
+        self.values = {}  # (name, labels) -> value, or [sum, count] for summaries
+        self.state = None
+        self.state_since = time.monotonic()
+        self.files = {}  # path -> (size, monotonic time) at the previous scrape
+
+    def _key(self, name, labels):
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric {name!r}")
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.values[key] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            summary = self.values.setdefault(key, [0.0, 0])
+            summary[0] += value
+            summary[1] += 1
+
+    def set_state(self, state):
+        """Moves to state, adding the time since the last change to the previous state."""
+        now = time.monotonic()
+        with self.lock:
+            if state == self.state:
+                return
+            if self.state is not None:
+                key = self._key("airnode_state_seconds_total", {"state": self.state})
+                self.values[key] = self.values.get(key, 0) + now - self.state_since
+            self.state, self.state_since = state, now
+
+    def watch_file(self, path):
+        with self.lock:
+            self.files.setdefault(path, None)
+
+    def _collect(self):
+        """Copies of the recorded values plus the values computed per scrape."""
+        now = time.monotonic()
+        with self.lock:
+            values = {key: list(value) if isinstance(value, list) else value for key, value in self.values.items()}
+            if self.state is not None:
+                values[self._key("airnode_state", {"state": self.state})] = 1
+                key = self._key("airnode_state_seconds_total", {"state": self.state})
+                values[key] = values.get(key, 0) + now - self.state_since
+
+            for path, previous in list(self.files.items()):
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                values[self._key("airnode_file_bytes", {"path": path})] = size
+                if previous is not None and now > previous[1]:
+                    # A cleared file counts as growing from zero
+                    grown = size - previous[0] if size >= previous[0] else size
+                    values[self._key("airnode_file_growth_bytes_per_second", {"path": path})] = grown / (now - previous[1])
+                self.files[path] = (size, now)
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        values[self._key("process_cpu_seconds_total", {})] = usage.ru_utime + usage.ru_stime
+        values[self._key("process_resident_memory_bytes", {})] = _rss_bytes()
+        values[self._key("process_max_resident_memory_bytes", {})] = usage.ru_maxrss * 1024
+        return values
+
+    def render(self):
+        """The registry in the Prometheus text exposition format."""
+        by_name = {}
+        for (name, labels), value in self._collect().items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in METRICS:
+            if name not in by_name:
+                continue
+            kind, help_text = METRICS[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name]):
+                labels = tuple(sorted(self.labels.items())) + labels
+                if kind == "summary":
+                    lines.append(f"{name}_sum{_labels(labels)} {_value(value[0])}")
+                    lines.append(f"{name}_count{_labels(labels)} {value[1]}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def set_state(state):
+    registry.set_state(state)
+
+
+def watch_file(path):
+    registry.watch_file(path)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # scrapes would otherwise flood the node's console output
+
+
+def serve(port=None, node=None, host="127.0.0.1"):
+    """
+    Serves /metrics on host:port (default $AIRNODE_METRICS_PORT) from a daemon
+    thread. Returns the server, or None if no port is set.
+    """
+    port = port if port is not None else int(os.environ.get(METRICS_PORT_ENV, 0) or 0)
+    if not port:
+        return None
+    if node:
+        registry.labels["node"] = node
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,489 @@
+"""
+node_transceiver.py
+
+One flowgraph that keeps the node's LimeSDR source and sink open and switches
+between the roles that used to be separate GRC flowgraphs:
+
+    rx        BPSK_RX_NodeX.py         BPSK receiver writing to out.txt
+    tx        BPSK_TX_*.py             BPSK packet source + ACK tone detector (port 4010)
+    ack       ack_tx.py                200 kHz CW tone at 445 MHz
+    two_tone  TwoToneTransciever.py    master two-tone, detector (8040), samples on 5020
+    echo      two_tone_slave.py        slave retransmission, detector (8040), samples on 5020
+    idle      nothing transmitted, receive samples discarded
+
+Each branch is built once. set_mode() locks the flowgraph, rewires the branch
+in, retunes the radio and unlocks, so a role change costs a retune and a
+scheduler restart (milliseconds) instead of closing the device, reopening it
+and recalibrating (seconds).
+
+Block parameters are the ones in the .grc files; SCRIPT_MODES maps each of
+those flowgraph names to a mode so FlowgraphManager can serve them from here.
+
+It has only run against the simulator so far, so air nodes use it only with
+combined_flowgraph set (off by default; air_sim.py sets it).
+
+With AIRNODE_DEVICE=sim:... the LimeSDR is replaced by a slot on the
+air_bus.py simulator (air_radio), so nodes and ground can share one machine.
+"""
+
+import os
+import threading
+import time
+import zlib
+import numpy as np
+import pmt
+import zmq
+from gnuradio import analog, blocks, digital, filter, gr, soapy, zeromq
+from gnuradio.filter import firdes
+from gnuradio.fft import window
+from frame_format import FRAME_PAD, is_framed
+from zmq_ports import ACK_PORT, SAMPLES_PORT, TWO_TONE_DETECT_PORT
+
+SAMPLE_RATE = 5e6
+SPS = 8
+EXCESS_BW = 0.35
+NFILTS = 32
+
+# Access code each node's (and the ground's) BPSK receiver correlates against
+ACCESS_CODES = {
+    "Node1": "10100001110001001111001011100111",
+    "Node2": "01011110001110110000110100011000",
+    "Node3": "11001010111100001011001110010001",
+    "GROUND": "00110101000011110100110001101110",
+}
+
+# Receiver front end per node: (source gain, squelch threshold, squelch gate, AGC max gain)
+RX_SETTINGS = {
+    "Node1": (30, -25, False, 4),
+    "Node2": (30, -35, True, 4),
+    "Node3": (30, -30, True, 2),
+    "GROUND": (40, -30, True, 2),  # BPSK_RX_DATA_GROUND.grc
+}
+
+# "driver=lime" for the LimeSDR; "sim:<host>:<base port>:<slot>" for a slot on the air_bus.py simulator
+DEVICE = os.environ.get("AIRNODE_DEVICE", "driver=lime")
+
+RX_FREQ = 433e6        # BPSK link
+ACK_FREQ = 445e6       # ACK tone channel
+ACK_TONE = 200e3
+MASTER_TX_FREQ = 435e6
+MASTER_RX_FREQ = 440e6
+SLAVE_RX_FREQ = 430e6
+SLAVE_TX_FREQ = 440e6
+
+# Flowgraph name -> (mode, options), so existing callers keep using the old names
+SCRIPT_MODES = {
+    "ack_tx": ("ack", {}),
+    "TwoToneTransciever": ("two_tone", {}),
+    "two_tone_slave": ("echo", {}),
+    "BPSK_TX_Node1": ("tx", {"destination": "Node1", "file_path": "command.txt", "repeats": 1500, "gain": 30}),
+    "BPSK_TX_Node2": ("tx", {"destination": "Node2", "file_path": "command.txt", "repeats": 1000, "gain": 40}),
+    "BPSK_TX_Node3": ("tx", {"destination": "Node3", "file_path": "command.txt", "repeats": 1000, "gain": 40}),
+    "BPSK_TX_DATA_Node1": ("tx", {"destination": "Node1", "file_path": "two_tone_slave_data.txt", "repeats": 1500, "gain": 50}),
+    "BPSK_TX_DATA_Node2": ("tx", {"destination": "Node2", "file_path": "two_tone_slave_data.txt", "repeats": 1500, "gain": 50}),
+    "BPSK_TX_DATA_Node3": ("tx", {"destination": "Node3", "file_path": "two_tone_slave_data.txt", "repeats": 1000, "gain": 55}),
+    # The node uploads Data.txt (upload_to_ground's output) to the ground. BPSK_TX_DATA_GROUND.grc still
+    # reads a fixed Node1Node2.txt; the transceiver follows the node code, not the .grc, here
+    "BPSK_TX_DATA_GROUND": ("tx", {"destination": "GROUND", "file_path": "Data.txt", "repeats": 3, "gain": 30,
+                                   "header_len": 512}),
+}
+for _node in ("Node1", "Node2", "Node3"):
+    SCRIPT_MODES[f"BPSK_RX_{_node}"] = ("rx", {})
+SCRIPT_MODES["BPSK_RX_DATA_GROUND"] = ("rx", {})  # the simulated ground runs on a transceiver too
+
+
+def access_code(identifier):
+    """The node's access code; nodes beyond the table get one derived from their name, the same on every node."""
+    if identifier in ACCESS_CODES:
+        return ACCESS_CODES[identifier]
+    return format(zlib.crc32(identifier.encode("ascii")), "032b")
+
+
+def script_mode(name):
+    """(mode, options) standing in for flowgraph `name`, or None. Nodes added to the mesh transmit with the Node3 settings."""
+    if name in SCRIPT_MODES:
+        return SCRIPT_MODES[name]
+    if name.startswith("BPSK_RX_Node"):
+        return "rx", {}
+    for prefix, template in (("BPSK_TX_DATA_", "BPSK_TX_DATA_Node3"), ("BPSK_TX_", "BPSK_TX_Node3")):
+        if name.startswith(prefix + "Node"):
+            mode, options = SCRIPT_MODES[template]
+            return mode, dict(options, destination=name[len(prefix):])
+    return None
+
+
+class packet_file_source(gr.sync_block):
+    """
+    repeat_packet_file_source that can be reloaded: 'A' header + file + 'A'
+    footer, repeated num_repeats times (forever if num_repeats <= 0), emitted by
+    cycling an offset over the one packet instead of slicing a repeated buffer.
+    """
+
+    def __init__(self):
+        gr.sync_block.__init__(self, name="Packet File Source", in_sig=None, out_sig=[np.uint8])
+        self.packet_lock = threading.Lock()
+        self.packet = np.zeros(0, dtype=np.uint8)
+        self.remaining = 0
+        self.offset = 0
+
+    def load(self, file_path, num_repeats, header_len=256, footer_len=256):
+        if not os.path.isfile(file_path):
+            raise ValueError(f"File not found: {file_path}")
+        with open(file_path, "rb") as f:
+            file_data = f.read()
+        if is_framed(file_data):
+            header_len = footer_len = FRAME_PAD  # self-delimiting frame: no long pad runs needed
+        packet = np.frombuffer(b"A" * header_len + file_data + b"A" * footer_len, dtype=np.uint8)
+        with self.packet_lock:
+            self.packet = packet
+            self.remaining = len(packet) * num_repeats if num_repeats > 0 else None
+            self.offset = 0
+
+    def work(self, input_items, output_items):
+        out = output_items[0]
+        with self.packet_lock:
+            written = 0
+            while written < len(out) and self.remaining != 0:
+                n = min(len(out) - written, len(self.packet) - self.offset)
+                if self.remaining is not None:
+                    n = min(n, self.remaining)
+                    self.remaining -= n
+                out[written:written + n] = self.packet[self.offset:self.offset + n]
+                written += n
+                self.offset = (self.offset + n) % len(self.packet)
+        return written
+
+
+class detect_tones(gr.sync_block):
+    """detect_single_tone / detect_two_tone: 1 when every RMS input exceeds the threshold, published on change over ZMQ."""
+
+    def __init__(self, num_inputs=1, threshold=0.01, zmq_port=4010):
+        gr.sync_block.__init__(self, name="detect_tones", in_sig=[np.float32] * num_inputs, out_sig=[np.float32])
+        self.threshold = threshold
+        self.last_sent = None
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.PUB)
+        self.socket.bind(f"tcp://*:{zmq_port}")
+        self.message_port_register_out(pmt.intern("detected_flag"))
+
+    def reset(self):
+        """Forget the last published value so the next state is always sent."""
+        self.last_sent = None
+
+    def work(self, input_items, output_items):
+        tone_value = 1 if all(np.mean(rms) > self.threshold for rms in input_items) else 0
+        if tone_value != self.last_sent:
+            self.socket.send_string(str(tone_value))
+            self.last_sent = tone_value
+        self.message_port_pub(pmt.intern("detected_flag"), pmt.from_long(tone_value))
+        output_items[0][:] = float(tone_value)
+        return len(output_items[0])
+
+
+class amplitude_control_complex(gr.sync_block):
+    """Multiplies the signal by an amplitude that latches to 0 once the detector reports 1."""
+
+    def __init__(self, default_value=1.0):
+        gr.sync_block.__init__(self, name="amplitude_control_complex", in_sig=[np.complex64], out_sig=[np.complex64])
+        self.default_value = default_value
+        self.reset()
+        self.message_port_register_in(pmt.intern("in"))
+        self.set_msg_handler(pmt.intern("in"), self.handle_msg)
+
+    def reset(self):
+        self.amplitude = self.default_value
+        self.amplitude_locked = False
+
+    def handle_msg(self, msg):
+        if pmt.is_integer(msg) or pmt.is_real(msg):
+            if pmt.to_long(msg) == 1 and not self.amplitude_locked:
+                self.amplitude = 0.0
+                self.amplitude_locked = True
+
+    def work(self, input_items, output_items):
+        output_items[0][:] = self.amplitude * input_items[0]
+        return len(output_items[0])
+
+
+class air_radio(gr.hier_block2):
+    """
+    Stands in for soapy.source / soapy.sink on the air_bus.py simulator. The
+    samples go over ZMQ to the bus; the setters node_transceiver uses report
+    tuning and gain to the bus instead of a device.
+    """
+
+    def __init__(self, dev, direction):
+        _, host, base_port, slot = dev.split(":")
+        base_port, self.slot = int(base_port), int(slot)
+        self.direction = direction
+        if direction == "rx":
+            gr.hier_block2.__init__(self, "air_radio_rx", gr.io_signature(0, 0, 0),
+                                    gr.io_signature(1, 1, gr.sizeof_gr_complex))
+            port = base_port + 2 + 2 * self.slot
+            self.zmq = zeromq.pull_source(gr.sizeof_gr_complex, 1, f"tcp://{host}:{port}", 100, False, -1, False)
+            self.connect(self.zmq, self)
+        else:
+            gr.hier_block2.__init__(self, "air_radio_tx", gr.io_signature(1, 1, gr.sizeof_gr_complex),
+                                    gr.io_signature(0, 0, 0))
+            port = base_port + 1 + 2 * self.slot
+            self.zmq = zeromq.push_sink(gr.sizeof_gr_complex, 1, f"tcp://{host}:{port}", 100, False, 4, False)
+            self.connect(self, self.zmq)
+        self.control = zmq.Context.instance().socket(zmq.PUSH)
+        self.control.setsockopt(zmq.LINGER, 0)
+        self.control.connect(f"tcp://{host}:{base_port}")
+
+    def _report(self, key, value):
+        self.control.send_json({"slot": self.slot, f"{self.direction}_{key}": value}, zmq.NOBLOCK)
+
+    def set_frequency(self, channel, frequency):
+        self._report("freq", frequency)
+
+    def set_gain(self, channel, gain):
+        self._report("gain", gain)
+
+    def set_sample_rate(self, channel, rate):
+        pass
+
+    def set_bandwidth(self, channel, bandwidth):
+        pass
+
+    def set_frequency_correction(self, channel, correction):
+        pass
+
+
+def open_radio(dev, samp_rate):
+    """(source, sink) for the device: the LimeSDR through soapy, or a slot on the simulated air bus."""
+    if dev.startswith("sim:"):
+        return air_radio(dev, "rx"), air_radio(dev, "tx")
+    source = soapy.source(dev, "fc32", 1, '', '', [''], [''])
+    sink = soapy.sink(dev, "fc32", 1, '', '', [''], [''])
+    for radio in (source, sink):
+        radio.set_sample_rate(0, samp_rate)
+        radio.set_bandwidth(0, 5e6)
+        radio.set_frequency_correction(0, 0)
+    return source, sink
+
+
+class node_transceiver(gr.top_block):
+
+    def __init__(self, identifier="Node1", out_file="out.txt", samp_rate=SAMPLE_RATE, dev=None):
+        gr.top_block.__init__(self, "Node Transceiver", catch_exceptions=True)
+        self.identifier = identifier
+        self.out_file = out_file
+        self.samp_rate = samp_rate
+        self.mode = None
+        self.active = None
+        self.mode_lock = threading.Lock()
+        self.running = False
+
+        ##################################################
+        # Device (opened once)
+        ##################################################
+        self.soapy_limesdr_source_0, self.soapy_limesdr_sink_0 = open_radio(dev or DEVICE, samp_rate)
+
+        self.silence = analog.sig_source_c(samp_rate, analog.GR_CONST_WAVE, 0, 0, 0)
+        self.discard = blocks.null_sink(gr.sizeof_gr_complex * 1)
+
+        ##################################################
+        # BPSK RX
+        ##################################################
+        rx_gain, squelch, gate, agc_max = RX_SETTINGS.get(identifier, RX_SETTINGS["Node1"])
+        self.rx_gain = rx_gain
+        BPSK = digital.constellation_bpsk().base()
+        rrc_taps = firdes.root_raised_cosine(NFILTS, NFILTS, 1.0 / float(SPS), 0.35, 11 * SPS * NFILTS)
+        self.analog_pwr_squelch_xx_0 = analog.pwr_squelch_cc(squelch, 1e-4, 0, gate)
+        self.analog_agc_xx_0 = analog.agc_cc(1e-4, 1.0, 1.0, agc_max)
+        self.digital_pfb_clock_sync_xxx_0 = digital.pfb_clock_sync_ccf(SPS, .0628, rrc_taps, NFILTS, 16, 1.5, 1)
+        self.digital_linear_equalizer_0 = digital.linear_equalizer(
+            15, 1, digital.adaptive_algorithm_cma(BPSK, .0001, 2).base(), True, [], 'corr_est')
+        self.digital_costas_loop_cc_0 = digital.costas_loop_cc(.0628, 2, False)
+        self.digital_constellation_decoder_cb_0 = digital.constellation_decoder_cb(BPSK)
+        self.digital_diff_decoder_bb_0 = digital.diff_decoder_bb(2, digital.DIFF_DIFFERENTIAL)
+        self.digital_correlate_access_code_xx_ts_0 = digital.correlate_access_code_bb_ts(
+            access_code(identifier), 1, '')
+        self.blocks_repack_bits_bb_0 = blocks.repack_bits_bb(1, 8, "", False, gr.GR_MSB_FIRST)
+        self.blocks_file_sink_0 = blocks.file_sink(gr.sizeof_char * 1, out_file, False)
+        self.blocks_file_sink_0.set_unbuffered(False)
+        self.rx_chain = [
+            self.analog_pwr_squelch_xx_0, self.analog_agc_xx_0, self.digital_pfb_clock_sync_xxx_0,
+            self.digital_linear_equalizer_0, self.digital_costas_loop_cc_0, self.digital_constellation_decoder_cb_0,
+            self.digital_diff_decoder_bb_0, self.digital_correlate_access_code_xx_ts_0, self.blocks_repack_bits_bb_0,
+            self.blocks_file_sink_0,
+        ]
+
+        ##################################################
+        # BPSK TX (one formatter per destination access code)
+        ##################################################
+        self.packet_source = packet_file_source()
+        self.blocks_stream_to_tagged_stream_0 = blocks.stream_to_tagged_stream(gr.sizeof_char, 1, 1, "packet_len")
+        self.blocks_tagged_stream_mux_0 = blocks.tagged_stream_mux(gr.sizeof_char * 1, 'packet_len', 0)
+        self.formatters = {destination: self._formatter(destination) for destination in ACCESS_CODES}
+        self.digital_constellation_modulator_0 = digital.generic_mod(
+            constellation=BPSK, differential=True, samples_per_symbol=SPS, pre_diff_code=True,
+            excess_bw=EXCESS_BW, verbose=False, log=False, truncate=False)
+        self.blocks_multiply_const_vxx_0 = blocks.multiply_const_cc(.5)
+
+        # ACK detector listening while transmitting
+        self.ack_filter = filter.fir_filter_ccf(
+            1, firdes.band_pass(1, samp_rate, 190e3, 210e3, 1000, window.WIN_HAMMING, 6.76))
+        self.ack_rms = blocks.rms_cf(0.0001)
+        self.detect_single_tone = detect_tones(1, threshold=.01, zmq_port=ACK_PORT)
+        self.ack_flag_sink = blocks.null_sink(gr.sizeof_float * 1)
+
+        ##################################################
+        # ACK tone
+        ##################################################
+        self.ack_tone = analog.sig_source_c(samp_rate, analog.GR_COS_WAVE, ACK_TONE, 1, 0, 0)
+
+        ##################################################
+        # Two-tone master / slave echo
+        ##################################################
+        self.tone_1 = analog.sig_source_c(samp_rate, analog.GR_COS_WAVE, 1e6, 10, 0, 0)
+        self.tone_2 = analog.sig_source_c(samp_rate, analog.GR_COS_WAVE, 2e6, 10, 0, 0)
+        self.tone_1_gate = amplitude_control_complex(1.0)
+        self.tone_2_gate = amplitude_control_complex(1.0)
+        self.blocks_add_xx_0 = blocks.add_vcc(1)
+        self.band_pass_filter_0 = filter.fir_filter_ccf(
+            1, firdes.band_pass(1, samp_rate, 900e3, 1.1e6, 1000, window.WIN_HAMMING, 6.76))
+        self.band_pass_filter_1 = filter.fir_filter_ccf(
+            1, firdes.band_pass(1, samp_rate, 1.9e6, 2.1e6, 1000, window.WIN_HAMMING, 6.76))
+        self.blocks_rms_xx_0 = blocks.rms_cf(0.0001)
+        self.blocks_rms_xx_1 = blocks.rms_cf(0.0001)
+        self.detect_two_tone = detect_tones(2, threshold=.01, zmq_port=TWO_TONE_DETECT_PORT)
+        self.two_tone_flag_sink = blocks.null_sink(gr.sizeof_float * 1)
+        self.zeromq_pub_sink_0 = zeromq.pub_sink(gr.sizeof_gr_complex, 1, f'tcp://*:{SAMPLES_PORT}', 100, False, 0, '', True, True)
+
+        self._wire("idle", {})
+
+    def start(self, max_noutput_items=10000000):
+        gr.top_block.start(self, max_noutput_items)
+        self.running = True
+
+    def stop(self):
+        gr.top_block.stop(self)
+        self.running = False
+
+    def set_mode(self, mode, **options):
+        """Switches role without closing the radio. Returns the switch time in seconds."""
+        with self.mode_lock:
+            start = time.monotonic()
+            if self.running:
+                self.lock()
+            try:
+                self.disconnect_all()
+                self._wire(mode, options)
+            finally:
+                if self.running:
+                    self.unlock()
+            elapsed = time.monotonic() - start
+        print(f"[Transceiver] {mode} in {elapsed * 1000:.1f} ms")
+        return elapsed
+
+    def activate(self, name):
+        """Switches to the mode that stands in for flowgraph `name` and returns a Popen-like handle."""
+        mode, options = script_mode(name)
+        self.set_mode(mode, **options)
+        self.active = ModeHandle(self, name, mode)
+        return self.active
+
+    @staticmethod
+    def _formatter(destination):
+        return digital.protocol_formatter_bb(digital.header_format_default(access_code(destination), 1), "packet_len")
+
+    def _tune(self, rx_freq=None, rx_gain=0, tx_freq=None, tx_gain=0):
+        if rx_freq is not None:
+            self.soapy_limesdr_source_0.set_frequency(0, rx_freq)
+        self.soapy_limesdr_source_0.set_gain(0, min(max(rx_gain, -12.0), 61.0))
+        if tx_freq is not None:
+            self.soapy_limesdr_sink_0.set_frequency(0, tx_freq)
+        self.soapy_limesdr_sink_0.set_gain(0, min(max(tx_gain, -12.0), 64.0))
+
+    def _wire(self, mode, options):
+        source, sink = self.soapy_limesdr_source_0, self.soapy_limesdr_sink_0
+
+        if mode == "rx":
+            self.blocks_file_sink_0.open(self.out_file)  # truncates, like starting BPSK_RX_NodeX
+            self.connect(source, self.rx_chain[0])
+            for upstream, downstream in zip(self.rx_chain, self.rx_chain[1:]):
+                self.connect(upstream, downstream)
+            self.connect(self.silence, sink)
+            self._tune(rx_freq=RX_FREQ, rx_gain=self.rx_gain)
+
+        elif mode == "tx":
+            destination = options.get("destination", "GROUND")
+            if destination not in self.formatters:
+                self.formatters[destination] = self._formatter(destination)
+            formatter = self.formatters[destination]
+            self.packet_source.load(options["file_path"], options.get("repeats", 1000),
+                                    options.get("header_len", 256))
+            self.detect_single_tone.reset()
+            self.connect(self.packet_source, self.blocks_stream_to_tagged_stream_0)
+            self.connect(self.blocks_stream_to_tagged_stream_0, formatter)
+            self.connect(formatter, (self.blocks_tagged_stream_mux_0, 0))
+            self.connect(self.blocks_stream_to_tagged_stream_0, (self.blocks_tagged_stream_mux_0, 1))
+            self.connect(self.blocks_tagged_stream_mux_0, self.digital_constellation_modulator_0)
+            self.connect(self.digital_constellation_modulator_0, self.blocks_multiply_const_vxx_0, sink)
+            self.connect(source, self.ack_filter, self.ack_rms, self.detect_single_tone, self.ack_flag_sink)
+            self._tune(rx_freq=ACK_FREQ, rx_gain=30, tx_freq=RX_FREQ, tx_gain=options.get("gain", 40))
+
+        elif mode == "ack":
+            self.connect(self.ack_tone, sink)
+            self.connect(source, self.discard)
+            self._tune(tx_freq=ACK_FREQ, tx_gain=40)
+
+        elif mode in ("two_tone", "echo"):
+            self.detect_two_tone.reset()
+            self.connect(source, self.band_pass_filter_0, self.blocks_rms_xx_0, (self.detect_two_tone, 0))
+            self.connect(source, self.band_pass_filter_1, self.blocks_rms_xx_1, (self.detect_two_tone, 1))
+            self.connect(self.detect_two_tone, self.two_tone_flag_sink)
+            self.connect(source, self.zeromq_pub_sink_0)
+            if mode == "two_tone":
+                self.tone_1_gate.reset()
+                self.tone_2_gate.reset()
+                self.connect(self.tone_1, self.tone_1_gate, (self.blocks_add_xx_0, 0))
+                self.connect(self.tone_2, self.tone_2_gate, (self.blocks_add_xx_0, 1))
+                self.connect(self.blocks_add_xx_0, sink)
+                self.msg_connect((self.detect_two_tone, 'detected_flag'), (self.tone_1_gate, 'in'))
+                self.msg_connect((self.detect_two_tone, 'detected_flag'), (self.tone_2_gate, 'in'))
+                self._tune(rx_freq=MASTER_RX_FREQ, rx_gain=30, tx_freq=MASTER_TX_FREQ, tx_gain=20)
+            else:
+                self.connect(source, sink)
+                self._tune(rx_freq=SLAVE_RX_FREQ, rx_gain=40, tx_freq=SLAVE_TX_FREQ, tx_gain=40)
+
+        elif mode == "idle":
+            self.connect(source, self.discard)
+            self.connect(self.silence, sink)
+            self._tune()
+
+        else:
+            raise ValueError(f"Unknown transceiver mode: {mode}")
+
+        if self.mode == "rx" and mode != "rx":
+            self.blocks_file_sink_0.close()
+        self.mode = mode
+
+
+class ModeHandle:
+    """Popen-like handle for one mode of a running node_transceiver; terminate() returns it to idle."""
+
+    def __init__(self, transceiver, name, mode):
+        self.transceiver = transceiver
+        self.name = name
+        self.mode = mode
+        self.stopped = threading.Event()
+
+    def poll(self):
+        # A later activate() replaces this mode just like starting another flowgraph would
+        if self.transceiver.active is not self:
+            self.stopped.set()
+        return 0 if self.stopped.is_set() else None
+
+    def terminate(self):
+        if self.poll() is None:
+            self.transceiver.set_mode("idle")
+            self.transceiver.active = None
+            self.stopped.set()
+
+    def wait(self, timeout=None):
+        self.stopped.wait(timeout)
+        return 0
@@ -0,0 +1,91 @@
+"""
+reassembly.py
+
+Combines the repeated copies of a BPSK transmission into one payload.
+
+The TX block repeats every payload hundreds of times, but the receivers used
+to keep only the first clean-looking copy. PacketVoter collects the copies
+instead. Copies are grouped by length, because a corrupted byte that the
+decoder dropped changes the length. Within the largest group, each byte is
+decided by majority vote. The payload is ready once min_repeats copies agree
+by a strict majority at every position, so the receiver can act (and ACK) as
+early as the link allows. An optional validate callable (e.g. a CRC check)
+accepts a single copy outright.
+"""
+
+import numpy as np
+
+
+class PacketVoter:
+    """Per-byte majority vote over repeated copies of one payload."""
+
+    def __init__(self, min_repeats=3, max_copies=15, validate=None, accept=None):
+        self.min_repeats = min_repeats
+        self.max_copies = max_copies
+        self.validate = validate  # payload -> bool; a valid copy is used without voting
+        self.accept = accept      # payload -> bool; copies failing it are not counted at all
+        self.reset()
+
+    def reset(self):
+        self.groups = {}  # length -> list of uint8 arrays
+        self.copies = 0
+        self.valid = None
+
+    def add(self, payload):
+        """Adds one received copy (bytes or str). Returns True once the payload is ready."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if self.accept is not None and not self.accept(payload):
+            return self.ready()
+        self.copies += 1
+        if self.validate is not None and self.valid is None and self.validate(payload):
+            self.valid = payload
+        group = self.groups.setdefault(len(payload), [])
+        if len(group) < self.max_copies:
+            group.append(np.frombuffer(payload, dtype=np.uint8))
+        return self.ready()
+
+    def _largest_group(self):
+        if not self.groups:
+            return None
+        return max(self.groups.values(), key=len)
+
+    @staticmethod
+    def vote(rows):
+        """Returns (payload bytes, votes for the winning byte at each position)."""
+        stack = np.stack(rows)
+        best = np.zeros(stack.shape[1], dtype=np.intp)
+        best_count = np.zeros(stack.shape[1], dtype=np.intp)
+        for i in range(len(stack)):
+            count = (stack == stack[i]).sum(axis=0)
+            better = count > best_count
+            best[better] = i
+            best_count[better] = count[better]
+        winner = stack[best, np.arange(stack.shape[1])]
+        return winner.tobytes(), best_count
+
+    def ready(self):
+        if self.valid is not None:
+            return True
+        rows = self._largest_group()
+        if rows is None or len(rows) < self.min_repeats:
+            return False
+        _, votes = self.vote(rows)
+        return bool(votes.size == 0 or votes.min() * 2 > len(rows))
+
+    def result(self, force=False):
+        """
+        (payload, agreement) once ready, else (None, 0.0). With force=True, the
+        best vote over whatever has arrived is returned (e.g. the sender stopped).
+        agreement is the smallest fraction of copies that agreed on any byte.
+        """
+        if self.valid is not None:
+            return self.valid, 1.0
+        if not force and not self.ready():
+            return None, 0.0
+        rows = self._largest_group()
+        if not rows:
+            return None, 0.0
+        payload, votes = self.vote(rows)
+        agreement = float(votes.min()) / len(rows) if votes.size else 1.0
+        return payload, agreement
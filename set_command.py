@@ -1,18 +1,27 @@
 import sys
+from frame_format import encode_command
 
-def set_command(destination, command, source):
-    """Saves the command information to command.txt with each value on a separate line."""
+def set_command(destination, command, source, framed=False):
+    """
+    Saves the command to command.txt for the TX flowgraph, with each value on a separate
+    line. framed=True writes it as one CRC-checked binary frame (frame_format.py) instead,
+    for nodes running with binary_frames.
+    """
+    if framed:
+        with open("command.txt", "wb") as file:
+            file.write(encode_command(destination, command, source))
+        return
     with open("command.txt", "w") as file:
         file.write(f"{destination}\n{command}\n{source}\n")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python set_command.py <destination> <command> <source>")
+    if len(sys.argv) not in (4, 5) or (len(sys.argv) == 5 and sys.argv[4] != "--framed"):
+        print("Usage: python set_command.py <destination> <command> <source> [--framed]")
         sys.exit(1)
 
     destination = sys.argv[1]
     command = sys.argv[2]
     source = sys.argv[3]
 
-    set_command(destination, command, source)
+    set_command(destination, command, source, framed=len(sys.argv) == 5)
     print(f"Command saved:\n{destination}\n{command}\n{source}")
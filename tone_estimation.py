@@ -0,0 +1,229 @@
+"""
+tone_estimation.py
+
+Frequency estimation for the two-tone offset measurement.
+
+The master/slave scripts used to take one FFT of the whole capture, argsort the
+full power spectrum and walk it in Python, so the answer was quantised to the
+bin width. These helpers find the strongest tones with an O(N) local-maximum +
+argpartition search, then estimate each tone between bins:
+
+    parabolic   fit through the log power of the peak bin and its neighbours
+    jacobsen    Jacobsen's estimator on the complex (unwindowed) spectrum
+    zoom        optional refinement of the DTFT peak on a mixed-down, decimated
+                copy of the capture (Goertzel-style single-frequency DFTs)
+
+Spectra can be a single FFT of the capture (trimmed to a 5-smooth length) or
+a Welch average of power-of-two windowed segments, which needs far fewer
+samples for a stable peak and costs time linear in the capture length.
+Only the Welch segment windows are cached (a handful of power-of-two lengths);
+the single-FFT window is computed per call, since capture lengths rarely repeat.
+
+Accuracy depends mostly on the capture length. bench_tone_estimation.py measured
+the p95 shift error on synthetic 5 MS/s captures at 10-30 dB SNR:
+
+    samples     parabolic   jacobsen / zoom
+    10 000      8 Hz        1.4 / 1.2 Hz (0.2 / 0.1 Hz at 30 dB)
+    100 000     0.8 Hz      0.04 Hz
+    1 000 000   0.08 Hz     < 0.01 Hz
+"""
+
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+GOLDEN = (np.sqrt(5) - 1) / 2
+
+
+def smooth_len(n, largest_prime=5, round_up=False):
+    """
+    Nearest length <= n (or >= n with round_up) whose prime factors are all
+    <= largest_prime (2 gives powers of two). FFTs of these lengths are fast;
+    lengths with large prime factors can be many times slower.
+    """
+    if n < 1:
+        return 1
+    primes = [p for p in (2, 3, 5) if p <= largest_prime]
+    best = None
+    lengths = [1]
+    for p in primes:
+        lengths = [l * p ** e for l in lengths for e in range(int(np.log(2 * n) / np.log(p)) + 2)]
+    for l in lengths:
+        if (round_up and l >= n and (best is None or l < best)) or (not round_up and l <= n and (best is None or l > best)):
+            best = l
+    return best
+
+
+@lru_cache(maxsize=16)
+def cached_window(length, kind="hann"):
+    """Read-only analysis window, computed once per (length, kind). For the fixed Welch segment lengths."""
+    win = np.hanning(length) if kind == "hann" else np.ones(length)
+    win.setflags(write=False)
+    return win
+
+
+def welch_spectrum(samples, sample_rate, nperseg=1 << 16, overlap=0.5, window="hann",
+                   largest_prime=2, batch=16):
+    """
+    Averaged power spectrum of overlapping windowed segments.
+    The segment length is rounded down to a power of two (largest_prime=2) or a
+    5-smooth length, and segments are transformed `batch` at a time, so the cost
+    is linear in the capture length whatever length the capture happened to reach.
+    Returns (freqs, power) in np.fft.fftfreq order.
+    """
+    samples = np.asarray(samples)
+    nperseg = smooth_len(min(nperseg, len(samples)), largest_prime)
+    step = max(1, int(nperseg * (1 - overlap)))
+    win = cached_window(nperseg, window)
+
+    frames = sliding_window_view(samples, nperseg)[::step]
+    power = np.zeros(nperseg)
+    for start in range(0, len(frames), batch):
+        spectra = np.fft.fft(frames[start:start + batch] * win, axis=1)
+        power += (spectra.real ** 2 + spectra.imag ** 2).sum(axis=0)
+    return np.fft.fftfreq(nperseg, d=1 / sample_rate), power / max(len(frames), 1)
+
+
+def auto_segment(n, max_segment=1 << 18, min_segments=4):
+    """Power-of-two segment length giving at least min_segments segments, capped at max_segment."""
+    return smooth_len(max(16, min(max_segment, n // min_segments)), 2)
+
+
+def strongest_peaks(power, freqs, count=2, min_freq=500e3, min_separation=10e3):
+    """
+    Indices of the `count` strongest local maxima with |f| > min_freq whose |f|
+    are at least min_separation apart, strongest first. O(N): candidates come
+    from argpartition instead of sorting the whole spectrum.
+    """
+    left = np.roll(power, 1)
+    right = np.roll(power, -1)
+    candidates = np.flatnonzero((power >= left) & (power > right) & (np.abs(freqs) > min_freq))
+    if len(candidates) == 0:
+        return np.array([], dtype=int)
+
+    take = min(len(candidates), max(8 * count, 32))
+    while True:
+        top = candidates[np.argpartition(power[candidates], -take)[-take:]]
+        top = top[np.argsort(power[top])[::-1]]
+
+        chosen = []
+        for k in top:
+            if all(abs(abs(freqs[k]) - abs(freqs[c])) > min_separation for c in chosen):
+                chosen.append(k)
+                if len(chosen) == count:
+                    return np.array(chosen)
+        if take == len(candidates):
+            return np.array(chosen, dtype=int)
+        take = min(len(candidates), take * 4)
+
+
+def parabolic_offset(power, k):
+    """Sub-bin offset of peak k from a parabola through the log power of bins k-1, k, k+1."""
+    n = len(power)
+    a, b, c = np.log(power[[(k - 1) % n, k, (k + 1) % n]] + 1e-300)
+    denom = a - 2 * b + c
+    if denom == 0:
+        return 0.0
+    return float(np.clip(0.5 * (a - c) / denom, -0.5, 0.5))
+
+
+def jacobsen_offset(spectrum, k):
+    """Jacobsen's sub-bin offset of peak k from the complex spectrum of an unwindowed FFT."""
+    n = len(spectrum)
+    prev, peak, nxt = spectrum[(k - 1) % n], spectrum[k], spectrum[(k + 1) % n]
+    denom = 2 * peak - prev - nxt
+    if denom == 0:
+        return 0.0
+    return float(np.clip(np.real((prev - nxt) / denom), -0.5, 0.5))
+
+
+def dft_at(samples, freq, sample_rate):
+    """Single-frequency DFT (what a Goertzel filter computes) of samples at freq Hz."""
+    t = np.arange(len(samples))
+    return np.dot(samples, np.exp(-2j * np.pi * freq / sample_rate * t))
+
+
+def zoom_refine(samples, freq, sample_rate, span=None, decimated_len=4096, iterations=40):
+    """
+    Refines a tone estimate by maximising |DTFT| within freq +/- span (one bin by default).
+    The capture is mixed down by freq and block-averaged to ~decimated_len samples
+    first, so each evaluation is cheap while the resolution of the full capture is kept.
+    """
+    samples = np.asarray(samples)
+    n = len(samples)
+    span = span or sample_rate / n
+
+    mixed = samples * np.exp(-2j * np.pi * freq / sample_rate * np.arange(n))
+    factor = max(1, n // decimated_len)
+    m = n // factor
+    decimated = mixed[:m * factor].reshape(m, factor).mean(axis=1)
+    decimated_rate = sample_rate / factor
+
+    def strength(offset):
+        return abs(dft_at(decimated, offset, decimated_rate))
+
+    # Golden-section search for the maximum of |DTFT| on [-span, span]
+    lo, hi = -span, span
+    x1 = hi - GOLDEN * (hi - lo)
+    x2 = lo + GOLDEN * (hi - lo)
+    f1, f2 = strength(x1), strength(x2)
+    for _ in range(iterations):
+        if f1 > f2:
+            hi, x2, f2 = x2, x1, f1
+            x1 = hi - GOLDEN * (hi - lo)
+            f1 = strength(x1)
+        else:
+            lo, x1, f1 = x1, x2, f2
+            x2 = lo + GOLDEN * (hi - lo)
+            f2 = strength(x2)
+    return freq + (lo + hi) / 2
+
+
+def check_settings(interpolation, nperseg):
+    """Raises ValueError for estimator settings that cannot be combined."""
+    if interpolation == "jacobsen" and nperseg:
+        raise ValueError("Jacobsen interpolation needs the complex spectrum of a single FFT; "
+                         "use nperseg=None or parabolic interpolation with Welch")
+
+
+def estimate_tones(samples, sample_rate, count=2, min_freq=500e3, min_separation=10e3,
+                   interpolation="parabolic", nperseg=None, refine=False, fast_len=True):
+    """
+    Estimates the frequencies of the `count` strongest tones, strongest first.
+    Returns absolute frequencies in Hz, like the original peak picker.
+
+    interpolation: "parabolic", "jacobsen" (single unwindowed FFT only, so not with nperseg) or None.
+    nperseg:       Welch segment length ("auto" picks a power of two from the capture
+                   length); None uses one FFT over the whole capture.
+    refine:        zoom/DFT refinement of each estimate on the full capture.
+    fast_len:      for the single FFT, drop the last few samples so the length is
+                   5-smooth (at most a fraction of a percent of the capture).
+    """
+    check_settings(interpolation, nperseg)
+    samples = np.asarray(samples)
+    if nperseg == "auto":
+        nperseg = auto_segment(len(samples))
+    if nperseg:
+        freqs, power = welch_spectrum(samples, sample_rate, nperseg=nperseg)
+        spectrum = None
+    else:
+        n = smooth_len(len(samples)) if fast_len else len(samples)
+        freqs = np.fft.fftfreq(n, d=1 / sample_rate)
+        head = samples[:n]
+        spectrum = np.fft.fft(head if interpolation == "jacobsen" else head * np.hanning(n))
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+
+    bin_width = sample_rate / len(power)
+    estimates = []
+    for k in strongest_peaks(power, freqs, count, min_freq, min_separation):
+        if interpolation == "jacobsen":
+            offset = jacobsen_offset(spectrum, k)
+        elif interpolation:
+            offset = parabolic_offset(power, k)
+        else:
+            offset = 0.0
+        freq = freqs[k] + offset * bin_width
+        if refine:
+            freq = zoom_refine(samples, freq, sample_rate, span=bin_width)
+        estimates.append(abs(freq))
+    return np.array(estimates)
@@ -0,0 +1,222 @@
+"""
+tracing.py
+
+Span tracing for calibration rounds: where did the time of a round go?
+
+Each process (air node or ground) writes its spans to a local JSONL file,
+one event per line:
+
+    {"ph": "B", "name": "ack_wait", "ts": 1718000000123456, "node": "Node2", "round": 3,
+     "master": "Node1", "slave": "Node2", "tid": 140..., "pid": 4242}
+    {"ph": "E", "name": "ack_wait", "ts": 1718000004567890, ..., "acked": true}
+
+ts is wall-clock microseconds, so traces from several processes on one
+machine line up. Every event carries the current context (node, round,
+master/slave pair, role) set with set_context(). The ground numbers its
+master cycles as rounds. A node numbers the master/slave rounds it has
+taken part in. A span's end event also carries the fields given to
+span.set(). Start events are written as the span opens, so a hung step
+still shows up in the file.
+
+Tracing is off until configure() is given a path. It is on when a node runs
+with --trace / AIRNODE_TRACE and the ground with --trace. Until then span()
+returns one shared no-op context manager and nothing is written. When on,
+each event costs one json.dumps and one line-buffered write.
+
+Export for chrome://tracing or https://ui.perfetto.dev:
+
+    python3 tracing.py export sim_run/*/trace.jsonl -o round.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+
+TRACE_ENV = "AIRNODE_TRACE"
+_RESERVED = ("ph", "name", "ts", "pid", "tid")
+
+
+class Tracer:
+    """Writes span events for one process to a JSONL file."""
+
+    def __init__(self, path, node=None):
+        self.path = path
+        self.file = open(path, "a", buffering=1)
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.context = {"node": node} if node else {}
+
+    def set_context(self, **fields):
+        """Fields added to every following event; a None value removes the field."""
+        with self.lock:
+            for key, value in fields.items():
+                if value is None:
+                    self.context.pop(key, None)
+                else:
+                    self.context[key] = value
+
+    def write(self, ph, name, fields=None):
+        event = {"ph": ph, "name": name, "ts": time.time_ns() // 1000, "pid": self.pid,
+                 "tid": threading.get_ident()}
+        with self.lock:
+            event.update(self.context)
+            if fields:
+                event.update(fields)
+            self.file.write(json.dumps(event, default=str) + "\n")
+
+    def span(self, name, **fields):
+        return _Span(self, name, fields)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class _Span:
+    def __init__(self, tracer, name, fields):
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+        self.result = {}
+
+    def set(self, **fields):
+        """Fields for the span's end event (outcomes such as acked=True)."""
+        self.result.update(fields)
+
+    def __enter__(self):
+        self.tracer.write("B", self.name, self.fields)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.result["error"] = exc_type.__name__
+        self.tracer.write("E", self.name, self.result)
+        return False
+
+
+class _NullSpan:
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+_tracer = None
+
+
+def configure(path=None, node=None):
+    """
+    Starts tracing this process to path (default $AIRNODE_TRACE); "{node}" in
+    the path is replaced by node. Without a path tracing stays off. Returns the Tracer or None.
+    """
+    global _tracer
+    path = path or os.environ.get(TRACE_ENV)
+    if not path:
+        return None
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(path.format(node=node or "process"), node)
+    return _tracer
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, **fields):
+    """Context manager timing one step; a no-op unless tracing is configured."""
+    if _tracer is None:
+        return NULL_SPAN
+    return _tracer.span(name, **fields)
+
+
+def instant(name, **fields):
+    """A point event (e.g. the two-tone detector firing)."""
+    if _tracer is not None:
+        _tracer.write("i", name, fields)
+
+
+def set_context(**fields):
+    if _tracer is not None:
+        _tracer.set_context(**fields)
+
+
+def traced(name=None):
+    """Decorator: runs the function inside span(name or the function's name)."""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def read_events(paths):
+    """Every event in the given JSONL files (a torn last line is skipped)."""
+    events = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+    return events
+
+
+def to_chrome(events):
+    """Chrome trace / Perfetto JSON: one process track per node, one thread track per thread."""
+    pids, tids, trace = {}, {}, []
+    for event in sorted(events, key=lambda e: e["ts"]):
+        process = event.get("node") or f"pid {event['pid']}"
+        if process not in pids:
+            pids[process] = len(pids) + 1
+            trace.append({"ph": "M", "name": "process_name", "pid": pids[process], "tid": 0,
+                          "args": {"name": process}})
+        key = (process, event["pid"], event["tid"])
+        if key not in tids:
+            tids[key] = len([k for k in tids if k[0] == process]) + 1
+            trace.append({"ph": "M", "name": "thread_name", "pid": pids[process], "tid": tids[key],
+                          "args": {"name": "main" if tids[key] == 1 else f"thread {tids[key]}"}})
+        out = {"ph": event["ph"], "name": event["name"], "ts": event["ts"], "pid": pids[process], "tid": tids[key],
+               "args": {k: v for k, v in event.items() if k not in _RESERVED}}
+        if out["ph"] == "i":
+            out["s"] = "t"
+        trace.append(out)
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def export_chrome(paths, output):
+    with open(output, "w") as f:
+        json.dump(to_chrome(read_events(paths)), f)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="merge JSONL traces into one Chrome/Perfetto trace")
+    export.add_argument("traces", nargs="+")
+    export.add_argument("-o", "--output", default="trace.json")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_chrome(args.traces, args.output)
+        print(f"Wrote {args.output}; open it in chrome://tracing or https://ui.perfetto.dev")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+two_tone_analysis.py
+
+Two-tone offset analysis shared by master_mode.py and slavemode.py.
+
+A TwoToneAnalyzer is configured once (sample rate, expected tones, expected
+carrier, estimator settings) and then turns a capture into the detected tones,
+the mean tone shift and the estimated carrier. It accepts NumPy arrays or
+capture files (memory-mapped through iq_capture), so the same object can be
+used in-process by the node scripts, offline, or from a benchmark.
+"""
+
+import numpy as np
+from iq_capture import load_capture
+from tone_estimation import estimate_tones, cached_window, auto_segment, check_settings, smooth_len
+
+SAMPLE_RATE = 5e6
+EXPECTED_TONES = (1e6, 2e6)
+MASTER_CARRIER = 440e6  # the master measures the slave's retransmission at 440 MHz
+SLAVE_CARRIER = 430e6   # the slave measures the master's two-tone at 430 MHz
+
+
+class TwoToneAnalyzer:
+    """Estimates tone shift and carrier frequency from two-tone captures."""
+
+    def __init__(self, expected_carrier, sample_rate=SAMPLE_RATE, expected_tones=EXPECTED_TONES,
+                 min_freq=500e3, min_separation=10e3, interpolation="parabolic", nperseg=None, refine=False):
+        check_settings(interpolation, nperseg)
+        self.expected_carrier = expected_carrier
+        self.sample_rate = sample_rate
+        self.expected_tones = np.array(expected_tones, dtype=float)
+        self.min_freq = min_freq
+        self.min_separation = min_separation
+        self.interpolation = interpolation
+        self.nperseg = nperseg
+        self.refine = refine
+
+    def warm_up(self, capture_len):
+        """Precomputes the Welch segment window for a typical capture length (nothing for the single FFT)."""
+        nperseg = auto_segment(capture_len) if self.nperseg == "auto" else self.nperseg
+        if nperseg:
+            cached_window(smooth_len(min(nperseg, capture_len), 2))
+
+    def detect_tones(self, samples):
+        """Strongest len(expected_tones) tones (Hz), or None if they cannot all be found."""
+        detected = estimate_tones(samples, self.sample_rate, count=len(self.expected_tones),
+                                  min_freq=self.min_freq, min_separation=self.min_separation,
+                                  interpolation=self.interpolation, nperseg=self.nperseg, refine=self.refine)
+        if len(detected) < len(self.expected_tones):
+            return None
+        return detected
+
+    def analyze(self, samples):
+        """
+        Returns a dict with detected_freqs, expected_freqs, frequency_shift and
+        carrier_frequency (the same keys iq_capture uses for capture metadata).
+        If two tones cannot be found, detected_freqs is all zeros, as before.
+        """
+        detected = self.detect_tones(samples)
+        found = detected is not None
+        if not found:
+            detected = np.zeros(len(self.expected_tones))
+
+        shift = float(np.mean(detected - self.expected_tones))
+        return {
+            "tones_found": found,
+            "detected_freqs": detected,
+            "expected_freqs": self.expected_tones,
+            "frequency_shift": shift,
+            "carrier_frequency": self.expected_carrier + shift,
+        }
+
+    def analyze_file(self, path):
+        """Analyzes a capture file (.npy/.cfile are memory-mapped, text dumps are parsed)."""
+        samples, _ = load_capture(path)
+        return self.analyze(samples)
@@ -0,0 +1,116 @@
+"""
+two_tone_corpus.py
+
+Synthetic two-tone captures with known impairments, to measure how accurate
+the offset estimation in two_tone_analysis.py is (see bench_tone_estimation.py).
+
+Each capture is what the LimeSDR would hand to capture_burst: complex64
+baseband samples of the 1 MHz / 2 MHz tones, both moved by the carrier offset,
+with these impairments applied in order:
+
+    snr_db        complex AWGN; SNR = total tone power / noise power over the full band
+    iq imbalance  Q branch scaled by iq_gain_db and skewed by iq_phase_deg (gives image tones)
+    dc_offset     constant complex DC added to every sample
+    gaps          flat / no-signal stretches like the ones IQdataClean.remove_flat_regions drops:
+                  a constant level plus noise below VAR_THRESHOLD
+
+The true tone frequencies and impairments are stored in the JSON sidecar of
+each saved capture (iq_capture format), so a corpus on disk can be scored
+later without the generator.
+
+Usage: python3 two_tone_corpus.py [--out two_tone_corpus] [--lengths 1e5 1e6] [--snr 0 10 20 30] [--count 5]
+"""
+
+import argparse
+import os
+from collections import namedtuple
+import numpy as np
+from iq_capture import save_capture
+from two_tone_analysis import SAMPLE_RATE, EXPECTED_TONES
+
+AMPLITUDE = 0.01  # per-tone amplitude, about what the LimeSDR delivers for the two-tone at our gains
+GAP_LENGTH = (60, 500)  # samples per flat region (min, max)
+
+Impairments = namedtuple("Impairments", ["offset", "snr_db", "dc_offset", "iq_gain_db", "iq_phase_deg", "gaps"])
+Impairments.__new__.__defaults__ = (0.0, 30.0, 0j, 0.0, 0.0, 0)
+Impairments.__doc__ = "Carrier offset (Hz), SNR (dB), DC offset, IQ gain/phase imbalance and number of flat gaps."
+
+
+def make_two_tone(n, impairments=Impairments(), sample_rate=SAMPLE_RATE, tones=EXPECTED_TONES, amplitude=AMPLITUDE,
+                  seed=None):
+    """A complex64 capture of n samples. The true tone frequencies are tones + impairments.offset."""
+    rng = np.random.default_rng(seed)
+    imp = impairments
+    t = np.arange(n) / sample_rate
+    iq = np.zeros(n, np.complex128)
+    for tone in tones:
+        iq += amplitude * np.exp(1j * (2 * np.pi * (tone + imp.offset) * t + rng.uniform(0, 2 * np.pi)))
+
+    if imp.snr_db is not None:
+        noise_power = len(tones) * amplitude ** 2 / 10 ** (imp.snr_db / 10)
+        iq += np.sqrt(noise_power / 2) * (rng.standard_normal(n) + 1j * rng.standard_normal(n))
+
+    if imp.iq_gain_db or imp.iq_phase_deg:
+        gain = 10 ** (imp.iq_gain_db / 20)
+        phase = np.deg2rad(imp.iq_phase_deg)
+        iq = iq.real + 1j * gain * (iq.imag * np.cos(phase) - iq.real * np.sin(phase))
+
+    iq += imp.dc_offset
+
+    # Same shapes as bench_remove_flat_regions.make_capture: a constant level with noise at or below the threshold
+    for start in rng.integers(0, max(1, n - GAP_LENGTH[1]), size=imp.gaps):
+        length = min(int(rng.integers(*GAP_LENGTH)), n - start)
+        level = rng.choice([0.0, 1e-4, 1e-3])
+        iq[start:start + length] = imp.dc_offset + level * (rng.standard_normal(length) +
+                                                            1j * rng.standard_normal(length))
+    return iq.astype(np.complex64)
+
+
+def true_freqs(impairments, tones=EXPECTED_TONES):
+    return np.array(tones, dtype=float) + impairments.offset
+
+
+def random_impairments(rng, snr_db, max_offset=5e3, dc=0.005, iq_gain_db=0.5, iq_phase_deg=3.0, gaps=0):
+    """Random carrier offset within +-max_offset and DC/IQ errors up to the given sizes."""
+    return Impairments(offset=float(rng.uniform(-max_offset, max_offset)), snr_db=snr_db,
+                       dc_offset=complex(*rng.uniform(-dc, dc, 2)),
+                       iq_gain_db=float(rng.uniform(-iq_gain_db, iq_gain_db)),
+                       iq_phase_deg=float(rng.uniform(-iq_phase_deg, iq_phase_deg)), gaps=gaps)
+
+
+def save_corpus(directory, lengths, snrs, count=5, seed=0, sample_rate=SAMPLE_RATE, **impairment_ranges):
+    """Writes count captures for every (length, SNR) pair as .npy + sidecar. Returns the paths."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for n in lengths:
+        for snr_db in snrs:
+            for k in range(count):
+                imp = random_impairments(rng, snr_db, **impairment_ranges)
+                iq = make_two_tone(n, imp, sample_rate, seed=int(rng.integers(1 << 31)))
+                path = os.path.join(directory, f"two_tone_{n}_{snr_db:g}dB_{k}.npy")
+                metadata = dict(imp._asdict(), sample_rate=sample_rate, true_freqs=true_freqs(imp),
+                                dc_offset=[imp.dc_offset.real, imp.dc_offset.imag])
+                save_capture(path, iq, metadata)
+                paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="two_tone_corpus")
+    parser.add_argument("--lengths", type=float, nargs="+", default=[1e4, 1e5, 1e6])
+    parser.add_argument("--snr", type=float, nargs="+", default=[0, 10, 20, 30], help="dB")
+    parser.add_argument("--count", type=int, default=5, help="captures per (length, SNR)")
+    parser.add_argument("--max-offset", type=float, default=5e3, help="carrier offsets are drawn from +-this (Hz)")
+    parser.add_argument("--gaps", type=int, default=0, help="flat regions per capture")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = save_corpus(args.out, [int(n) for n in args.lengths], args.snr, args.count, args.seed,
+                        max_offset=args.max_offset, gaps=args.gaps)
+    print(f"Wrote {len(paths)} captures to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,12 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
+from iq_capture import load_capture
 
 def load_two_tone_data(filename):
-    samples = []
-    with open(filename, 'r') as f:
-        for line in f:
-            if line.startswith("#") or line.strip() == "":
-                continue
-            parts = line.strip().split()
-            if len(parts) == 2:
-                try:
-                    real = float(parts[0])
-                    imag = float(parts[1])
-                    samples.append(real + 1j * imag)
-                except ValueError:
-                    continue
-    return np.array(samples, dtype=np.complex64)
+    """Loads a capture (.npy/.cfile with JSON sidecar, or a legacy text dump)."""
+    samples, _ = load_capture(filename)
+    return samples
 
 def plot_time_and_frequency(samples, sample_rate=5e6):
     # Time domain plot
@@ -49,7 +39,7 @@ def plot_time_and_frequency(samples, sample_rate=5e6):
     plt.show()
 
 if __name__ == "__main__":
-    filename = "two_tone_master_data.txt"
+    filename = "two_tone_master_data.npy"
     data = load_two_tone_data(filename)
     if data.size == 0:
         print("No data found in file.")
@@ -0,0 +1,14 @@
+"""
+zmq_ports.py
+
+Local ZMQ ports used between the flowgraphs and the protocol scripts.
+AIRSIM_PORT_OFFSET shifts all of them, so that several nodes can run on one
+host (air_sim.py gives each simulated node its own offset).
+"""
+
+import os
+
+PORT_OFFSET = int(os.environ.get("AIRSIM_PORT_OFFSET", "0"))
+ACK_PORT = 4010 + PORT_OFFSET  # ACK tone detector of the BPSK TX flowgraphs ("1"/"0")
+TWO_TONE_DETECT_PORT = 8040 + PORT_OFFSET  # two-tone detector flags
+SAMPLES_PORT = 5020 + PORT_OFFSET  # two-tone flowgraph sample stream